@@ -2,10 +2,17 @@
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional
 
 from services.generator import generate_system
+from services.generate_stream import (
+    stream_generate,
+    STREAM_FORMATS as GENERATE_STREAM_FORMATS,
+    MEDIA_TYPES as GENERATE_MEDIA_TYPES,
+    DEFAULT_FLUSH_SIZE,
+)
 from services.history import (
     apply_history as apply_history_service,
     load_history_from_parsed,
@@ -17,6 +24,9 @@ from services.history import (
     compute_adjacency_analysis,
 )
 from services.greedy import greedy_entry
+from services.greedy_incremental import extend_system
+from services.greedy_stream import stream_greedy, STREAM_FORMATS, MEDIA_TYPES
+from services.candidate_cache import cache_stats
 from services.budget import budget_optimize_fixed_count, budget_optimize_money
 from services.ai_predictor import (
     score_system,
@@ -30,6 +40,10 @@ from services.ai_recommended_patterns import (
     pro_to_free_preview as patterns_free_preview,
 )
 from services.fusion_engine import compute_fusion_ranking
+from services.jobs import submit_job, get_job, cancel_job
+from services.verifier import verify_wheel
+from services.coverage import coverage_metrics, COVERAGE_TS, MAX_COVERAGE_T
+from services.prize_distribution import prize_distribution
 from services.ai_smart_tips import compute_ai_smart_tips, pro_to_free_preview as smart_tips_free_preview
 from services.ai_ticket_generator import generate_ai_tickets, pro_to_free_preview as tickets_free_preview
 
@@ -67,6 +81,14 @@ def root():
 class GeneratorRequest(BaseModel):
     numbers: List[int]
     limit: Optional[int] = None
+    # Пагинация: страница [offset, offset + page_size) списка комбинаций
+    offset: Optional[int] = None
+    page_size: Optional[int] = None
+    # Только точное число подходящих комбинаций, без самих комбинаций
+    count_only: bool = False
+    # Равномерная случайная выборка sample комбинаций (seed — воспроизводимость)
+    sample: Optional[int] = None
+    seed: Optional[int] = None
 
     fixed_positions: Optional[dict] = None
     forced_numbers: Optional[List[int]] = None
@@ -93,11 +115,33 @@ def generate(req: GeneratorRequest):
             min_num=req.min_num,
             max_num=req.max_num,
             per_ball_ranges=req.per_ball_ranges,
+            offset=req.offset,
+            page_size=req.page_size,
+            count_only=req.count_only,
+            sample=req.sample,
+            seed=req.seed,
         )
     except Exception as e:
         print("GENERATOR ERROR:", repr(e))
         raise HTTPException(status_code=400, detail=str(e))
 
+
+@app.post("/generate/stream")
+def generate_stream(req: GeneratorRequest, format: str = "ndjson", flush_size: int = DEFAULT_FLUSH_SIZE):
+    # format: "ndjson" (по умолчанию) | "json"; flush_size — комбинаций в одной пачке
+    if format not in GENERATE_STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown stream format: {format}")
+    try:
+        body = stream_generate(req.model_dump(), format, flush_size)
+    except Exception as e:
+        print("GENERATOR ERROR:", repr(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        body,
+        media_type=GENERATE_MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ==========================================================
 # REQUEST MODELS
 # ==========================================================
@@ -113,17 +157,54 @@ class HistoryApplyRequest(BaseModel):
 
 class GreedyRequest(BaseModel):
     numbers: List[int]
-    mode: Optional[str] = "classic"
+    mode: Optional[str] = "classic"   # classic | lazy | index | fast | hybrid | chunked | anneal | auto
     attempts: Optional[int] = 5
     sample_size: Optional[int] = 2000
+    backend: Optional[str] = "int"     # "int" | "numpy"
+    memory_limit_mb: Optional[int] = 256   # потолок памяти для mode="chunked"
+    seed: Optional[int] = None             # воспроизводимость mode="fast"
+    workers: Optional[int] = None          # процессы для попыток mode="fast"
+    time_budget_ms: Optional[int] = None   # бюджет времени для mode="anneal" и "auto"
+    use_library: Optional[bool] = True     # mode="classic": готовая система из библиотеки
+    ticket_size: Optional[int] = None      # k — чисел в билете (по умолчанию BALL_COUNT)
+    guarantee: Optional[int] = None        # t — гарантированных совпадений (по умолчанию 3)
+    draw_match: Optional[int] = None       # m — выпавших чисел в пуле (по умолчанию t)
+
+
+class GreedyExtendRequest(BaseModel):
+    system: List[List[int]]                # система для прежнего пула
+    numbers: List[int]                     # новый пул
+    prune: Optional[bool] = False          # убрать ставшие избыточными билеты
 
 
 class BudgetRequest(BaseModel):
     numbers: List[int]
-    mode: str = "count"
+    mode: str = "count"                    # count | money | weighted | curve
     ticket_count: Optional[int] = None
     budget: Optional[float] = None
     ticket_cost: Optional[float] = None
+    seed: Optional[int] = None         # воспроизводимый tie-breaker / перемешивание
+
+
+class VerifyRequest(BaseModel):
+    system: List[List[int]]
+    numbers: Optional[List[int]] = None    # пул; по умолчанию числа из system
+    draw_match: int = 3                    # m — сколько чисел пула выпало
+    guarantee: Optional[int] = None        # t — заявленная гарантия
+    max_worst: int = 100                   # сколько худших тиражей вернуть
+
+
+class CoverageRequest(BaseModel):
+    system: List[List[int]]
+    numbers: Optional[List[int]] = None    # пул; по умолчанию числа из system
+    # какие t считать (1..MAX_COVERAGE_T); по умолчанию 2, 3, 4
+    ts: Optional[List[Annotated[int, Field(ge=1, le=MAX_COVERAGE_T)]]] = None
+
+
+class PrizeDistributionRequest(BaseModel):
+    system: List[List[int]]
+    game: str = "5/69"                     # профиль игры "k/N"
+    workers: Optional[int] = None          # процессы; по умолчанию cpu_count()
 
 
 class AIScoreRequest(BaseModel):
@@ -191,40 +272,136 @@ def ai(
 
 @app.post("/greedy")
 def greedy(req: GreedyRequest):
-    return greedy_entry(req.numbers, req.mode, req.attempts, req.sample_size)
+    return greedy_entry(
+        req.numbers,
+        req.mode,
+        req.attempts,
+        req.sample_size,
+        req.backend,
+        req.memory_limit_mb,
+        req.seed,
+        req.workers,
+        req.time_budget_ms,
+        req.use_library,
+        req.ticket_size,
+        req.guarantee,
+        req.draw_match,
+    )
+
+
+@app.post("/greedy/stream")
+def greedy_stream(req: GreedyRequest, format: str = "ndjson"):
+    # format: "ndjson" (по умолчанию) | "sse"
+    if format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown stream format: {format}")
+    return StreamingResponse(
+        stream_greedy(req.model_dump(), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/greedy/extend")
+def greedy_extend(req: GreedyExtendRequest):
+    return extend_system(req.system, req.numbers, prune=req.prune)
+
+
+@app.get("/candidate_cache")
+def candidate_cache_stats():
+    return cache_stats()
 
 
 @app.post("/budget")
 def budget(req: BudgetRequest):
-    from services.budget import run_budget, budget_optimize_money
-    from services.history import get_history
+    from services.budget import budget_entry
+
+    # FREE MODE — by ticket count ("count"), PRO MODE — by money ("money")
+    return budget_entry(
+        numbers=req.numbers,
+        mode=req.mode,
+        ticket_count=req.ticket_count,
+        budget=req.budget,
+        ticket_cost=req.ticket_cost,
+        history_rows=_history_rows(),  # передаем историю
+        seed=req.seed,
+    )
+
 
+def _history_rows():
     # Получаем данные из истории
     history = get_history()
-    history_rows = [row["main"] for row in history] if history else None
+    return [row["main"] for row in history] if history else None
 
-    # -----------------------------
-    # FREE MODE — by ticket count
-    # -----------------------------
-    if req.mode == "count":
-        return run_budget(
-            numbers=req.numbers,
-            ticket_count=req.ticket_count,
-            history_rows=history_rows  # передаем историю
-        )
 
-    # -----------------------------
-    # PRO MODE — by money
-    # -----------------------------
-    if req.mode == "money":
-        return budget_optimize_money(
-            numbers=req.numbers,
-            budget=req.budget,
-            ticket_cost=req.ticket_cost,
-            history_rows=history_rows  # передаем историю
-        )
+@app.post("/verify")
+def verify(req: VerifyRequest):
+    return verify_wheel(
+        system=req.system,
+        numbers=req.numbers,
+        draw_match=req.draw_match,
+        guarantee=req.guarantee,
+        max_worst=req.max_worst,
+    )
+
+
+@app.post("/coverage")
+def coverage(req: CoverageRequest):
+    result = coverage_metrics(req.system, req.numbers, req.ts or COVERAGE_TS)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+@app.post("/prize_distribution")
+def prize_distribution_route(req: PrizeDistributionRequest):
+    return prize_distribution(system=req.system, game=req.game, workers=req.workers)
+
+
+# ==========================================================
+# BACKGROUND JOBS (greedy / budget / generate)
+# ==========================================================
+
+def _submit_response(result):
+    # Ошибка постановки: переполнение пула — 429, неизвестный вид задачи — 400
+    if "error" in result:
+        status = 429 if result.get("reason") == "too_many_jobs" else 400
+        raise HTTPException(status_code=status, detail=result["error"])
+    return result
+
+
+def _job_response(result):
+    # status="failed" вместе с error — обычный ответ о задаче, не ошибка HTTP
+    if result is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return result
+
+
+@app.post("/jobs/greedy")
+def create_greedy_job(req: GreedyRequest):
+    return _submit_response(submit_job("greedy", req.model_dump()))
+
+
+@app.post("/jobs/budget")
+def create_budget_job(req: BudgetRequest):
+    params = req.model_dump()
+    params["history_rows"] = _history_rows()
+    return _submit_response(submit_job("budget", params))
+
+
+@app.post("/jobs/generate")
+def create_generate_job(req: GeneratorRequest):
+    return _submit_response(submit_job("generate", req.model_dump()))
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return _job_response(get_job(job_id))
+
+
+@app.delete("/jobs/{job_id}")
+def job_cancel(job_id: str):
+    return _job_response(cancel_job(job_id))
 
-    return {"error": "Invalid budget mode"}
 # ==========================================================
 # AI QUALITY / AI INSIDE
 # ==========================================================
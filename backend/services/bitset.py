@@ -0,0 +1,192 @@
+# backend/services/bitset.py
+from __future__ import annotations
+from itertools import combinations
+from typing import List, Dict, Tuple, Sequence, Iterator
+
+import numpy as np
+
+
+# ==========================================================
+# NumPy bitset backend для масок покрытия
+# ==========================================================
+# Маски всех кандидатов лежат в одном непрерывном массиве
+# (n_candidates, ceil(U / 64)) uint64. Бит i слова w строки r
+# означает, что билет r покрывает тройку с индексом w * 64 + i.
+# Это та же раскладка, что и у int-масок backend="int" в greedy.py,
+# только без накладных расходов интерпретатора на &, ~ и bit_count().
+
+# Сколько строк обрабатываем за один векторный проход:
+# ограничивает размер временных массивов при подсчёте приростов.
+SWEEP_ROWS = 1 << 16
+
+
+def n_words(U: int) -> int:
+    """Число uint64-слов на маску для вселенной из U троек."""
+    return max(1, (U + 63) // 64)
+
+
+def full_words(U: int) -> np.ndarray:
+    """Маска «все U троек не покрыты» в виде массива слов."""
+    words = np.zeros(n_words(U), dtype=np.uint64)
+    full, rest = divmod(U, 64)
+    words[:full] = np.uint64(0xFFFFFFFFFFFFFFFF)
+    if rest:
+        words[full] = np.uint64((1 << rest) - 1)
+    return words
+
+
+def triple_rank_table(v: int) -> np.ndarray:
+    """
+    Таблица (v, v, v) int32: позиции (i < j < k) в отсортированном пуле ->
+    индекс тройки в порядке combinations(pool, 3). Для остальных ячеек -1.
+    """
+    table = np.full((v, v, v), -1, dtype=np.int32)
+    for idx, (i, j, k) in enumerate(combinations(range(v), 3)):
+        table[i, j, k] = idx
+    return table
+
+
+def ranks_from_positions(positions: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """
+    Индексы троек для строк positions (n, k) — позиций чисел в пуле.
+    Порядок столбцов совпадает с combinations(combo, 3).
+    """
+    k = positions.shape[1]
+    cols = [
+        table[positions[:, a], positions[:, b], positions[:, c]]
+        for a, b, c in combinations(range(k), 3)
+    ]
+    return np.stack(cols, axis=1)
+
+
+def triple_ranks(
+    combos: Sequence[Tuple[int, ...]],
+    base: List[int],
+) -> np.ndarray:
+    """
+    Индексы троек для каждого кандидата: массив (n, C(k, 3)) int32.
+    Считается векторно через таблицу позиций pos(a), pos(b), pos(c) -> индекс.
+    """
+    if not combos:
+        return np.zeros((0, 0), dtype=np.int32)
+
+    values = np.asarray(combos, dtype=np.int64)
+    positions = np.searchsorted(np.asarray(base, dtype=np.int64), values)
+    return ranks_from_positions(positions, triple_rank_table(len(base)))
+
+
+def pack_ranks(ranks: np.ndarray, U: int) -> np.ndarray:
+    """
+    Упаковывает индексы троек (n, m) в битовые маски (n, ceil(U/64)) uint64.
+    В пределах одного столбца пары (строка, слово) уникальны,
+    поэтому каждый столбец ставится одним векторным |=.
+    """
+    n = ranks.shape[0]
+    words = np.zeros((n, n_words(U)), dtype=np.uint64)
+    rows = np.arange(n)
+    one = np.uint64(1)
+    for j in range(ranks.shape[1]):
+        col = ranks[:, j]
+        ok = col >= 0
+        r = col[ok].astype(np.uint64)
+        words[rows[ok], (r >> np.uint64(6)).astype(np.intp)] |= one << (r & np.uint64(63))
+    return words
+
+
+def gains(words: np.ndarray, uncovered: np.ndarray) -> np.ndarray:
+    """
+    Прирост каждого кандидата: popcount(words[r] & uncovered) за один
+    векторный проход (по блокам SWEEP_ROWS строк, чтобы временный
+    массив AND не раздувал память).
+    """
+    out = np.zeros(words.shape[0], dtype=np.int64)
+    if not uncovered.any():
+        return out
+
+    for start in range(0, words.shape[0], SWEEP_ROWS):
+        block = words[start:start + SWEEP_ROWS]
+        out[start:start + SWEEP_ROWS] = np.bitwise_count(block & uncovered).sum(axis=1, dtype=np.int64)
+    return out
+
+
+def greedy_picks(words: np.ndarray, U: int, stats: Dict) -> Iterator[Tuple[int, int]]:
+    """
+    Классический greedy-цикл на uint64-битсетах: на каждом шаге
+    приросты кандидатов считаются одним векторным AND+popcount.
+    Прирост только убывает, поэтому строки с нулевым приростом
+    периодически выбрасываются (уплотняем копию, когда их набралось 25%).
+    argmax берёт первый максимум — ничьи решаются как в int-версии.
+    """
+    uncovered = full_words(U)
+    alive = np.arange(words.shape[0])
+    live_words = words
+
+    while alive.size and uncovered.any():
+        g = gains(live_words, uncovered)
+        stats["gain_evaluations"] += int(alive.size)
+
+        pos = int(np.argmax(g))
+        best_gain = int(g[pos])
+        if best_gain == 0:
+            break
+
+        best_idx = int(alive[pos])
+        yield best_idx, best_gain
+        uncovered &= ~words[best_idx]
+
+        keep = g > 0
+        keep[pos] = False
+        if keep.sum() < alive.size * 3 // 4:
+            alive = alive[keep]
+            live_words = words[alive]
+
+
+# ==========================================================
+# Взвешенные приросты (Fast Greedy) по массиву индексов троек
+# ==========================================================
+
+def full_flags(U: int) -> np.ndarray:
+    """Флаги «тройка не покрыта» для всей вселенной."""
+    return np.ones(U, dtype=bool)
+
+
+# Веса Fast Greedy целочисленные: прирост = новые тройки * RARITY_SCALE +
+# сумма весов round(RARITY_SCALE / rarity). Целые суммы не зависят от
+# порядка сложения, поэтому backend="int" и "numpy" дают одни и те же
+# ничьи в argmax и ранжировании.
+RARITY_SCALE = 1 << 20
+
+
+def as_weights(weights: Sequence[int]) -> np.ndarray:
+    """Веса троек (greedy._build_rarity_weights) в виде int64-массива."""
+    return np.asarray(weights, dtype=np.int64)
+
+
+def weighted_gains(ranks: np.ndarray, weights: np.ndarray, uncovered: np.ndarray) -> np.ndarray:
+    """
+    Векторный аналог greedy._ai_weight_for_mask для всех строк сразу:
+    число новых троек * RARITY_SCALE + сумма весов этих троек (int64).
+    """
+    gained = uncovered[ranks]
+    g = gained.sum(axis=1, dtype=np.int64)
+    bonus = np.where(gained, weights[ranks], 0).sum(axis=1, dtype=np.int64)
+    return np.where(g > 0, g * RARITY_SCALE + bonus, 0)
+
+
+def weighted_greedy(ranks: np.ndarray, weights: np.ndarray, U: int) -> Tuple[List[int], int]:
+    """
+    Greedy по сэмплу с AI-весами.
+    Возвращает (локальные индексы выбранных строк, число непокрытых троек).
+    """
+    uncovered = full_flags(U)
+    chosen: List[int] = []
+
+    while uncovered.any() and ranks.shape[0]:
+        sc = weighted_gains(ranks, weights, uncovered)
+        best = int(np.argmax(sc))
+        if sc[best] <= 0:
+            break
+        chosen.append(best)
+        uncovered[ranks[best]] = False
+
+    return chosen, int(uncovered.sum())
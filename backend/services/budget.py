@@ -1,17 +1,30 @@
 # backend/services/budget.py
 from __future__ import annotations
 
+import heapq
 from itertools import combinations
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterator, Callable
 from collections import Counter
 import random
 
-from .config import BALL_COUNT
-from .greedy import has_four_in_row, _build_triple_universe
+import numpy as np
+
+from .candidate_cache import candidate_set, relabel
+from .coverage import coverage_metrics
+from . import bitset
 
 
 Triplet = Tuple[int, int, int]
 
+# progress(done, total, info): шаг done из total — выбранные билеты
+# (weighted / curve) или этапы ранжирования (count / money); info —
+# {"current_coverage": %}, где покрытие уже известно. Может бросить
+# исключение, чтобы прервать расчёт (отмена фоновых задач, services/jobs.py).
+BudgetProgressFn = Callable[[int, int, Dict], None]
+
+# Этапы budget_optimize_fixed_count: кандидаты, ранжирование, метрика покрытия
+_FIXED_COUNT_STAGES = 3
+
 
 def _triplet_counts_from_history(history_rows: List[List[int]]) -> Counter[Triplet]:
     cnt: Counter[Triplet] = Counter()
@@ -24,6 +37,21 @@ def _triplet_counts_from_history(history_rows: List[List[int]]) -> Counter[Tripl
     return cnt
 
 
+def _dense_triplet_counts(base: List[int], U: int, trip_cnt: Counter[Triplet]) -> np.ndarray:
+    """Частоты троек пула массивом int64 по индексу тройки (как в combinations(base, 3))."""
+    freq = np.zeros(U, dtype=np.int64)
+    table = bitset.triple_rank_table(len(base))
+    pos = {x: i for i, x in enumerate(base)}
+    for (a, b, c), cnt in trip_cnt.items():
+        if a in pos and b in pos and c in pos:
+            freq[table[pos[a], pos[b], pos[c]]] = cnt
+    return freq
+
+
+# Младшие биты ключа сортировки под случайный tie-breaker
+_TIEBREAK_BITS = 20
+
+
 # ==========================================================
 # Smart Budget — Fixed number of tickets (DUAL MODE)
 # ==========================================================
@@ -32,6 +60,8 @@ def budget_optimize_fixed_count(
     numbers: List[int],
     max_tickets: int,
     history_rows: Optional[List[List[int]]] = None,
+    seed: Optional[int] = None,
+    progress: Optional[BudgetProgressFn] = None,
 ) -> Dict:
 
     base = sorted(set(numbers))
@@ -47,14 +77,15 @@ def budget_optimize_fixed_count(
         }
 
     # --------------------------------------------------
-    # Generate candidate combinations
+    # Candidate combinations (shared cache, position space)
     # --------------------------------------------------
-    candidates = [
-        c for c in combinations(base, BALL_COUNT)
-        if not has_four_in_row(c)
-    ]
+    cands = candidate_set(base)
+    ranks = cands["ranks"]
+    n = ranks.shape[0]
+    if progress:
+        progress(1, _FIXED_COUNT_STAGES, {})
 
-    if not candidates:
+    if n == 0:
         return {
             "mode": "budget",
             "system": [],
@@ -65,6 +96,12 @@ def budget_optimize_fixed_count(
             "warning": "No valid combinations found"
         }
 
+    # Один seed на запрос: случайный tie-breaker / перемешивание воспроизводимы
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    rng = np.random.default_rng(seed)
+    k = min(max_tickets, n)
+
     # --------------------------------------------------
     # MODE A — History-aware (triplet-frequency ranked)
     # --------------------------------------------------
@@ -75,42 +112,37 @@ def budget_optimize_fixed_count(
         if not trip_cnt:
             history_rows = None
         else:
-            rng = random.SystemRandom()
-
-            def history_score(combo) -> Tuple[float, int]:
-                # score = sum of triplet frequencies found in history
-                # tie-breaker = random int (so equal-score combos don't stay deterministic)
-                s = 0
-                for t in combinations(combo, 3):
-                    s += trip_cnt.get(tuple(sorted(t)), 0)
-                return (float(s), rng.randrange(1_000_000))
-
-            ranked = sorted(candidates, key=history_score, reverse=True)
-            chosen = ranked[:max_tickets]
+            # score = сумма частот троек билета: один gather-sum по матрице рангов;
+            # tie-breaker = случайные младшие биты ключа (равные score не детерминированы)
+            freq = _dense_triplet_counts(base, cands["U"], trip_cnt)
+            scores = freq[ranks].sum(axis=1)
+            keys = (scores << _TIEBREAK_BITS) | rng.integers(0, 1 << _TIEBREAK_BITS, size=n)
+
+            # top-k без полной сортировки: argpartition, затем сортируем только k
+            top = np.argpartition(-keys, k - 1)[:k] if k < n else np.arange(n)
+            chosen_idx = top[np.argsort(-keys[top], kind="stable")]
             mode = "budget_history_ranked"
 
     # --------------------------------------------------
     # MODE B — Neutral (no history)
     # --------------------------------------------------
     if not history_rows:
-        rng = random.SystemRandom()
-        shuffled = candidates[:]
-        rng.shuffle(shuffled)
-        chosen = shuffled[:max_tickets]
+        chosen_idx = rng.choice(n, size=k, replace=False)
         mode = "budget_neutral"
 
+    chosen = relabel(base, cands["positions"][chosen_idx])
+    if progress:
+        progress(2, _FIXED_COUNT_STAGES, {})
+
     # --------------------------------------------------
     # Informational coverage metric (NOT optimization goal)
     # --------------------------------------------------
-    all_triples, _ = _build_triple_universe(base)
-    U = len(all_triples)
-
-    covered = set()
-    for c in chosen:
-        for t in combinations(c, 3):
-            covered.add(tuple(sorted(t)))
-
-    coverage = round(len(covered) / U * 100, 2) if U > 0 else 0.0
+    metrics = coverage_metrics([list(c) for c in chosen], base)
+    U = metrics[3]["total"]
+    covered_total = metrics[3]["covered"]
+    coverage = metrics[3]["coverage"]
+    if progress:
+        progress(3, _FIXED_COUNT_STAGES, {"current_coverage": coverage})
 
     return {
         "mode": mode,
@@ -118,7 +150,226 @@ def budget_optimize_fixed_count(
         "system_size": len(chosen),
         "coverage": coverage,
         "triplets_total": U,
-        "triplets_covered": len(covered),
+        "triplets_covered": covered_total,
+        "coverage_by_t": metrics,
+        "seed": seed,
+    }
+
+
+# ==========================================================
+# Smart Budget — взвешенное максимальное покрытие
+# ==========================================================
+# Задача: не больше max_tickets билетов, максимум суммарного веса
+# покрытых троек. Вес тройки — её частота в истории (_triplet_counts_from_history),
+# поэтому пересекающиеся билеты не получают вес одних и тех же троек дважды.
+# Решаем lazy greedy (CELF) с кучей: прирост только убывает, так что
+# пересчитываем лишь кандидата на вершине. Стартовая куча — heapify, без
+# полной сортировки кандидатов.
+#
+# Целочисленный вес: w = частота * _WEIGHT_SCALE + 1. Пока есть непокрытые
+# тройки из истории, решает частота; дальше (или без истории) — обычное
+# число новых троек. _WEIGHT_SCALE > C(5, 3), поэтому +1 не перебивает частоту.
+
+_WEIGHT_SCALE = 11
+
+# После стольких пересчётов без выбора билета кучу выгоднее пересобрать целиком
+_REBUILD_MIN = 1024
+
+
+def _history_weights(base: List[int], U: int, history_rows: Optional[List[List[int]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(частоты троек пула в истории, веса freq * _WEIGHT_SCALE + 1)."""
+    if history_rows:
+        freq = _dense_triplet_counts(base, U, _triplet_counts_from_history(history_rows))
+    else:
+        freq = np.zeros(U, dtype=np.int64)
+    return freq, freq * _WEIGHT_SCALE + 1
+
+
+def _weighted_picks(
+    ranks: np.ndarray,
+    weights: np.ndarray,
+    uncovered: np.ndarray,
+    max_tickets: int,
+    stats: Dict[str, int],
+    progress: Optional[BudgetProgressFn] = None,
+) -> Iterator[int]:
+    """
+    Lazy greedy по весам троек: выдаёт индексы выбранных кандидатов по одному
+    и снимает их тройки из uncovered. Префикс выдачи — ответ для любого
+    меньшего лимита (свойство greedy), на этом строится budget_curve().
+    progress вызывается после каждого выбранного билета.
+    """
+    n = ranks.shape[0]
+    U = uncovered.size
+    covered = U - int(uncovered.sum())
+    steps = min(max_tickets, n)
+    heap = [(-g, i, 0) for i, g in enumerate(weights[ranks].sum(axis=1).tolist())]
+    heapq.heapify(heap)
+    stats["gain_evaluations"] += n
+
+    picked = 0
+    stale = 0
+    rebuild_after = max(_REBUILD_MIN, n // 16)
+
+    while heap and picked < max_tickets:
+        neg_gain, i, stamp = heap[0]
+        if stamp == picked:
+            heapq.heappop(heap)
+            row = ranks[i]
+            covered += int(uncovered[row].sum())
+            uncovered[row] = False
+            picked += 1
+            stale = 0
+            if progress:
+                progress(picked, steps, {"current_coverage": round(covered / U * 100, 2)})
+            yield i
+            continue
+
+        if stale >= rebuild_after:
+            # Слишком много устаревших вершин подряд — пересчитываем всю кучу
+            # векторно; порядок (-прирост, индекс) тот же, что у CELF
+            alive = np.fromiter((e[1] for e in heap), dtype=np.intp, count=len(heap))
+            fresh = (weights * uncovered)[ranks[alive]].sum(axis=1)
+            stats["gain_evaluations"] += alive.size
+            heap = [(-int(g), int(j), picked) for g, j in zip(fresh.tolist(), alive.tolist()) if g > 0]
+            heapq.heapify(heap)
+            stale = 0
+            continue
+
+        row = ranks[i]
+        gain = int(weights[row][uncovered[row]].sum())
+        stats["gain_evaluations"] += 1
+        stale += 1
+        if gain == 0:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (-gain, i, picked))
+
+
+def budget_weighted_max_coverage(
+    numbers: List[int],
+    max_tickets: int,
+    history_rows: Optional[List[List[int]]] = None,
+    progress: Optional[BudgetProgressFn] = None,
+) -> Dict:
+    base = sorted(set(numbers))
+    if max_tickets is None or max_tickets <= 0:
+        return {
+            "mode": "budget_weighted",
+            "system": [],
+            "system_size": 0,
+            "coverage": 0.0,
+            "triplets_total": 0,
+            "triplets_covered": 0,
+            "warning": "Ticket limit must be > 0"
+        }
+
+    cands = candidate_set(base)
+    ranks = cands["ranks"]
+    U = cands["U"]
+    if ranks.shape[0] == 0:
+        return {
+            "mode": "budget_weighted",
+            "system": [],
+            "system_size": 0,
+            "coverage": 0.0,
+            "triplets_total": U,
+            "triplets_covered": 0,
+            "warning": "No valid combinations found"
+        }
+
+    freq, weights = _history_weights(base, U, history_rows)
+    uncovered = np.ones(U, dtype=bool)
+    stats = {"gain_evaluations": 0}
+    chosen = list(_weighted_picks(ranks, weights, uncovered, max_tickets, stats, progress))
+
+    covered_total = U - int(uncovered.sum())
+    history_total = int(freq.sum())
+    history_covered = int(freq[~uncovered].sum())
+    system = [list(c) for c in relabel(base, cands["positions"][chosen])]
+
+    return {
+        "mode": "budget_weighted",
+        "system": system,
+        "system_size": len(system),
+        "coverage": round(covered_total / U * 100, 2) if U > 0 else 0.0,
+        "triplets_total": U,
+        "triplets_covered": covered_total,
+        "history_weight_total": history_total,
+        "history_weight_covered": history_covered,
+        "weighted_coverage": round(history_covered / history_total * 100, 2) if history_total else None,
+        "gain_evaluations": stats["gain_evaluations"],
+    }
+
+
+# ==========================================================
+# Кривая «бюджет -> покрытие» за один проход
+# ==========================================================
+
+def budget_curve(
+    numbers: List[int],
+    max_tickets: int,
+    history_rows: Optional[List[List[int]]] = None,
+    ticket_cost: Optional[float] = None,
+    progress: Optional[BudgetProgressFn] = None,
+) -> Dict:
+    """
+    Один проход weighted greedy до max_tickets. Первые k билетов — ответ
+    mode="weighted" для ticket_count=k, поэтому точка кривой для каждого k:
+      {tickets, cost, triplets_covered, coverage, history_weight_covered, weighted_coverage}
+    system — полный порядок выбора; система для k билетов = system[:k].
+    """
+    base = sorted(set(numbers))
+    if max_tickets is None or max_tickets <= 0:
+        return {"error": "Ticket limit must be > 0"}
+
+    cands = candidate_set(base)
+    ranks = cands["ranks"]
+    U = cands["U"]
+    if ranks.shape[0] == 0:
+        return {
+            "mode": "budget_curve",
+            "curve": [],
+            "system": [],
+            "triplets_total": U,
+            "warning": "No valid combinations found"
+        }
+
+    freq, weights = _history_weights(base, U, history_rows)
+    history_total = int(freq.sum())
+    uncovered = np.ones(U, dtype=bool)
+    stats = {"gain_evaluations": 0}
+
+    seen = np.zeros(U, dtype=bool)
+    chosen: List[int] = []
+    curve: List[Dict] = []
+    covered = 0
+    history_covered = 0
+    for i in _weighted_picks(ranks, weights, uncovered, max_tickets, stats, progress):
+        chosen.append(i)
+        row = ranks[i]
+        new = row[~seen[row]]
+        seen[new] = True
+        covered += new.size
+        history_covered += int(freq[new].sum())
+        curve.append({
+            "tickets": len(chosen),
+            "cost": round(len(chosen) * ticket_cost, 2) if ticket_cost else None,
+            "triplets_covered": covered,
+            "coverage": round(covered / U * 100, 2),
+            "history_weight_covered": history_covered,
+            "weighted_coverage": round(history_covered / history_total * 100, 2) if history_total else None,
+        })
+
+    return {
+        "mode": "budget_curve",
+        "curve": curve,
+        "system": [list(c) for c in relabel(base, cands["positions"][chosen])],
+        "max_tickets": max_tickets,
+        "ticket_cost": ticket_cost,
+        "triplets_total": U,
+        "history_weight_total": history_total,
+        "gain_evaluations": stats["gain_evaluations"],
     }
 
 
@@ -126,24 +377,40 @@ def budget_optimize_fixed_count(
 # Budget by Money
 # ==========================================================
 
+def _tickets_for_budget(budget: Optional[float], ticket_cost: Optional[float]) -> Tuple[int, Optional[str]]:
+    """
+    Лимит билетов по деньгам: (budget // ticket_cost, None)
+    или (0, текст ошибки). Общий для всех денежных режимов.
+    """
+    if not ticket_cost or ticket_cost <= 0:
+        return 0, "Ticket cost must be > 0"
+    if budget is None:
+        return 0, "Budget is required"
+    max_tickets = int(budget // ticket_cost)
+    if max_tickets <= 0:
+        return 0, "Budget too small"
+    return max_tickets, None
+
+
 def budget_optimize_money(
     numbers: List[int],
     budget: float,
     ticket_cost: float,
     history_rows: Optional[List[List[int]]] = None,
+    seed: Optional[int] = None,
+    progress: Optional[BudgetProgressFn] = None,
 ) -> Dict:
 
-    if ticket_cost <= 0:
-        return {"error": "Ticket cost must be > 0"}
-
-    max_tickets = int(budget // ticket_cost)
-    if max_tickets <= 0:
-        return {"error": "Budget too small"}
+    max_tickets, error = _tickets_for_budget(budget, ticket_cost)
+    if error:
+        return {"error": error}
 
     return budget_optimize_fixed_count(
         numbers=numbers,
         max_tickets=max_tickets,
-        history_rows=history_rows
+        history_rows=history_rows,
+        seed=seed,
+        progress=progress
     )
 
 
@@ -151,10 +418,78 @@ def budget_optimize_money(
 # API WRAPPER (for FastAPI)
 # ==========================================================
 
+def budget_entry(
+    numbers: List[int],
+    mode: str = "count",
+    ticket_count: Optional[int] = None,
+    budget: Optional[float] = None,
+    ticket_cost: Optional[float] = None,
+    history_rows: Optional[List[List[int]]] = None,
+    seed: Optional[int] = None,
+    progress: Optional[BudgetProgressFn] = None,
+) -> Dict:
+    """
+    Единая точка входа /budget (и фоновых задач):
+      mode="count"    — FREE, по числу билетов
+      mode="money"    — PRO, по бюджету и цене билета
+      mode="weighted" — взвешенное по истории максимальное покрытие;
+                        лимит — ticket_count или budget // ticket_cost
+      mode="curve"    — кривая покрытия для 1..лимита билетов за один проход
+    progress — см. BudgetProgressFn.
+    """
+    if mode == "count":
+        return run_budget(
+            numbers=numbers,
+            ticket_count=ticket_count,
+            history_rows=history_rows,
+            seed=seed,
+            progress=progress
+        )
+
+    if mode == "money":
+        return budget_optimize_money(
+            numbers=numbers,
+            budget=budget,
+            ticket_cost=ticket_cost,
+            history_rows=history_rows,
+            seed=seed,
+            progress=progress
+        )
+
+    if mode == "weighted":
+        if ticket_count is None and budget is not None:
+            ticket_count, error = _tickets_for_budget(budget, ticket_cost)
+            if error:
+                return {"error": error}
+        return budget_weighted_max_coverage(
+            numbers=numbers,
+            max_tickets=ticket_count,
+            history_rows=history_rows,
+            progress=progress
+        )
+
+    if mode == "curve":
+        if ticket_count is None and budget is not None:
+            ticket_count, error = _tickets_for_budget(budget, ticket_cost)
+            if error:
+                return {"error": error}
+        return budget_curve(
+            numbers=numbers,
+            max_tickets=ticket_count,
+            history_rows=history_rows,
+            ticket_cost=ticket_cost,
+            progress=progress
+        )
+
+    return {"error": "Invalid budget mode"}
+
+
 def run_budget(
     numbers: List[int],
     ticket_count: int,
-    history_rows: Optional[List[List[int]]] = None
+    history_rows: Optional[List[List[int]]] = None,
+    seed: Optional[int] = None,
+    progress: Optional[BudgetProgressFn] = None
 ) -> Dict:
     """
     Thin API wrapper for FastAPI.
@@ -163,5 +498,7 @@ def run_budget(
     return budget_optimize_fixed_count(
         numbers=numbers,
         max_tickets=ticket_count,
-        history_rows=history_rows
+        history_rows=history_rows,
+        seed=seed,
+        progress=progress
     )
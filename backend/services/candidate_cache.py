@@ -0,0 +1,166 @@
+# backend/services/candidate_cache.py
+from __future__ import annotations
+import os
+import sys
+import threading
+from collections import OrderedDict
+from math import comb
+from typing import List, Dict, Tuple, Any, Callable
+
+import numpy as np
+
+from .config import BALL_COUNT
+from . import bitset
+from .greedy_chunked import position_blocks
+
+
+# ==========================================================
+# Общий кэш кандидатов для greedy / budget
+# ==========================================================
+# Кандидаты C(v, BALL_COUNT) без 4-в-ряд, их индексы троек и маски
+# не зависят от конкретных чисел пула — только от его размера v и от
+# того, какие соседние позиции заняты подряд идущими числами (правило
+# 4-в-ряд). Поэтому храним всё в пространстве позиций 0..v-1 под ключом
+# (v, сигнатура соседства) и переименовываем в числа пула на выходе.
+# Индекс тройки по позициям совпадает с индексом в combinations(base, 3),
+# так что маски и ранги годятся для любого пула с той же сигнатурой.
+#
+# Кэш процесса: LRU с ограничением по байтам, счётчики попаданий/промахов.
+
+CACHE_MAX_MB = int(os.environ.get("CANDIDATE_CACHE_MB", "256"))
+
+class _LruBytesCache:
+    """LRU-словарь с ограничением суммарного размера значений."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Any, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key: Any, build: Callable[[], Tuple[Any, int]]) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+
+        # Сборка вне блокировки: параллельный запрос того же ключа
+        # просто соберёт значение ещё раз
+        value, size = build()
+
+        with self._lock:
+            if size > self.max_bytes:
+                return value
+            if key not in self._items:
+                self._items[key] = (value, size)
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+_cache = _LruBytesCache(CACHE_MAX_MB * 1024 * 1024)
+
+
+def pool_signature(base: List[int]) -> Tuple[int, int]:
+    """(v, битовая маска: бит i = base[i + 1] == base[i] + 1)."""
+    adjacent = 0
+    for i in range(len(base) - 1):
+        if base[i + 1] == base[i] + 1:
+            adjacent |= 1 << i
+    return len(base), adjacent
+
+
+def _build_candidates(v: int, adjacent: int) -> Tuple[Dict[str, Any], int]:
+    # Числа с той же сигнатурой соседства: подряд идут там же, где в пуле
+    values = np.zeros(v, dtype=np.int64)
+    for i in range(1, v):
+        values[i] = values[i - 1] + (1 if (adjacent >> (i - 1)) & 1 else 2)
+
+    upper = comb(v, BALL_COUNT)
+    positions = np.empty((upper, BALL_COUNT), dtype=np.uint8)
+    n = 0
+    for rows in position_blocks(values, BALL_COUNT):
+        positions[n:n + rows.shape[0]] = rows
+        n += rows.shape[0]
+    positions = positions[:n].copy()
+
+    ranks = bitset.ranks_from_positions(positions.astype(np.intp), bitset.triple_rank_table(v))
+    entry = {"positions": positions, "ranks": ranks, "U": comb(v, 3)}
+    return entry, positions.nbytes + ranks.nbytes
+
+
+def candidate_set(base: List[int]) -> Dict[str, Any]:
+    """
+    Кандидаты пула base (отсортированного, без повторов) в пространстве позиций:
+      {positions: uint8 (n, BALL_COUNT), ranks: int32 (n, C(BALL_COUNT, 3)), U: int}
+    Массивы общие для всех запросов — не изменять.
+    """
+    v, adjacent = pool_signature(base)
+    return _cache.get_or_build(("candidates", v, adjacent), lambda: _build_candidates(v, adjacent))
+
+
+def candidate_masks(base: List[int]) -> List[int]:
+    """Маски троек кандидатов как Python int (порядок — как в candidate_set)."""
+    v, adjacent = pool_signature(base)
+
+    def build() -> Tuple[List[int], int]:
+        ranks = candidate_set(base)["ranks"]
+        masks = []
+        for row in ranks.tolist():
+            m = 0
+            for r in row:
+                m |= 1 << r
+            masks.append(m)
+        return masks, sys.getsizeof(masks) + sum(sys.getsizeof(m) for m in masks)
+
+    return _cache.get_or_build(("masks", v, adjacent), build)
+
+
+def candidate_words(base: List[int]) -> np.ndarray:
+    """uint64-битсеты кандидатов (n, ceil(U / 64)) для backend="numpy"."""
+    v, adjacent = pool_signature(base)
+
+    def build() -> Tuple[np.ndarray, int]:
+        cands = candidate_set(base)
+        words = bitset.pack_ranks(cands["ranks"], cands["U"])
+        return words, words.nbytes
+
+    return _cache.get_or_build(("words", v, adjacent), build)
+
+
+def relabel(base: List[int], positions: np.ndarray) -> List[Tuple[int, ...]]:
+    """Позиции -> кортежи чисел пула."""
+    return [tuple(row) for row in np.asarray(base, dtype=np.int64)[positions].tolist()]
+
+
+def cache_stats() -> Dict[str, int]:
+    return _cache.stats()
+
+
+def clear_cache() -> None:
+    _cache.clear()
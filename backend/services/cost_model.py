@@ -0,0 +1,241 @@
+# backend/services/cost_model.py
+from __future__ import annotations
+import argparse
+import json
+import math
+import os
+import time
+from functools import lru_cache
+from math import comb
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from .config import BALL_COUNT
+
+
+# ==========================================================
+# Модель стоимости greedy-движков для mode="auto"
+# ==========================================================
+# Время движка оценивается степенной функцией от объёма работы
+# W = candidates * U (кандидаты C(v, 5) на тройки C(v, 3)):
+#     predicted_ms = exp(c0) * W ** c1
+# Коэффициенты c0, c1 подбираются МНК в log-log по замерам на сплошных
+# пулах (calibrate()) и лежат в data/greedy_cost_model.json.
+# Память движков, которые держат маску на каждого кандидата:
+#     bytes ≈ candidates * (base + per_triple * U)
+#
+# Выбор (choose_engine):
+#   1) готовая система из библиотеки, если есть;
+#   2) из движков, что влезают в memory_limit_mb и latency budget,
+#      берём лучший по качеству системы, при равенстве — самый быстрый;
+#   3) если в бюджет не влезает никто — самый быстрый из допустимых.
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "greedy_cost_model.json")
+
+# Качество системы: больше — короче система при 100% покрытии.
+# lazy / numpy / chunked дают одну и ту же систему greedy.
+ENGINE_QUALITY = {
+    "anneal": 3,
+    "hybrid": 2,
+    "lazy": 1,
+    "numpy": 1,
+    "chunked": 1,
+    "fast": 0,
+}
+
+# Движки, которые держат все маски кандидатов в памяти
+IN_MEMORY_ENGINES = ("lazy", "numpy", "hybrid", "fast", "anneal")
+
+# Бюджет по умолчанию, если time_budget_ms не задан
+DEFAULT_LATENCY_BUDGET_MS = 5000
+
+# Anneal выбираем, только если стартовый greedy занимает не больше
+# этой доли бюджета — иначе на локальный поиск не остаётся времени
+_ANNEAL_GREEDY_SHARE = 0.5
+
+CALIBRATION_V = (10, 14, 18, 22, 26, 30, 34)
+FAST_CALIBRATION_V = (16, 20, 24, 28, 32)
+
+
+@lru_cache(maxsize=1)
+def load_model(path: str = MODEL_PATH) -> Dict:
+    """Модель из data/greedy_cost_model.json. Нет файла — пустая модель."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def pool_features(v: int) -> Dict[str, int]:
+    candidates = comb(v, BALL_COUNT)
+    U = comb(v, 3)
+    return {"pool_size": v, "candidates": candidates, "triplets_total": U, "work": candidates * U}
+
+
+def _predict_fit(fit: Dict[str, float], work: int) -> float:
+    return math.exp(fit["c0"] + fit["c1"] * math.log(max(work, 1)))
+
+
+def predict_ms(
+    engine: str,
+    v: int,
+    attempts: int = 5,
+    workers: Optional[int] = None,
+    time_budget_ms: Optional[int] = None,
+    model: Optional[Dict] = None,
+) -> Optional[float]:
+    """Предсказанное время движка на пуле размера v, мс. None — нет данных."""
+    model = load_model() if model is None else model
+    fits = model.get("engines", {})
+    work = pool_features(v)["work"]
+
+    if engine == "anneal":
+        if "lazy" not in fits or time_budget_ms is None:
+            return None
+        return max(float(time_budget_ms), _predict_fit(fits["lazy"], work))
+
+    fit = fits.get(engine)
+    if fit is None:
+        return None
+    ms = _predict_fit(fit, work)
+    if engine == "fast":
+        # Модель снята для одной попытки в одном процессе
+        rounds = math.ceil(max(1, attempts or 1) / max(1, workers or os.cpu_count() or 1))
+        ms *= rounds
+    return ms
+
+
+def predict_memory_mb(engine: str, v: int, model: Optional[Dict] = None) -> float:
+    if engine not in IN_MEMORY_ENGINES:
+        return 0.0
+    model = load_model() if model is None else model
+    mem = model.get("memory", {"base": 200.0, "per_triple": 0.14})
+    f = pool_features(v)
+    return f["candidates"] * (mem["base"] + mem["per_triple"] * f["triplets_total"]) / (1024 * 1024)
+
+
+def choose_engine(
+    v: int,
+    memory_limit_mb: int,
+    time_budget_ms: Optional[int] = None,
+    attempts: int = 5,
+    workers: Optional[int] = None,
+    library_hit: bool = False,
+) -> Dict:
+    """
+    Выбор движка для mode="auto".
+    Возвращает {engine, predicted_ms, reason, predictions: {engine: ms}}.
+    """
+    if library_hit:
+        return {"engine": "library", "predicted_ms": 0.0, "reason": "library design", "predictions": {}}
+
+    model = load_model()
+    budget = DEFAULT_LATENCY_BUDGET_MS if time_budget_ms is None else time_budget_ms
+
+    predictions: Dict[str, float] = {}
+    # anneal последним: его допуск зависит от прогноза lazy
+    for engine in sorted(ENGINE_QUALITY, key=lambda e: e == "anneal"):
+        if engine == "fast" and v <= 15:
+            continue
+        if engine == "anneal":
+            lazy_ms = predictions.get("lazy")
+            if time_budget_ms is None or lazy_ms is None or lazy_ms > time_budget_ms * _ANNEAL_GREEDY_SHARE:
+                continue
+        if predict_memory_mb(engine, v, model) > memory_limit_mb:
+            continue
+        ms = predict_ms(engine, v, attempts, workers, time_budget_ms, model)
+        if ms is not None:
+            predictions[engine] = ms
+
+    if not predictions:
+        # Нет модели — chunked работает на любом пуле в пределах памяти
+        return {"engine": "chunked", "predicted_ms": None, "reason": "no cost model", "predictions": {}}
+
+    fitting = [e for e, ms in predictions.items() if ms <= budget]
+    if fitting:
+        engine = min(fitting, key=lambda e: (-ENGINE_QUALITY[e], predictions[e]))
+        reason = f"best quality within {budget} ms"
+    else:
+        engine = min(predictions, key=predictions.get)
+        reason = f"nothing fits {budget} ms, fastest engine"
+
+    return {
+        "engine": engine,
+        "predicted_ms": round(predictions[engine], 1),
+        "reason": reason,
+        "predictions": {e: round(ms, 1) for e, ms in predictions.items()},
+    }
+
+
+# ==========================================================
+# Калибровка
+# ==========================================================
+
+def _fit(points: List[Tuple[int, float]]) -> Dict[str, float]:
+    """МНК для log(ms) = c0 + c1 * log(W)."""
+    x = np.log([max(w, 1) for w, _ in points])
+    y = np.log([max(ms, 0.1) for _, ms in points])
+    c1, c0 = np.polyfit(x, y, 1)
+    return {"c0": round(float(c0), 4), "c1": round(float(c1), 4), "points": len(points)}
+
+
+def _measure(engine: str, pool: List[int]) -> float:
+    from .greedy import greedy_cover, hybrid_greedy, fast_greedy_v2
+    from .greedy_chunked import chunked_greedy_cover
+
+    started = time.perf_counter()
+    if engine == "lazy":
+        greedy_cover(pool, engine="lazy")
+    elif engine == "numpy":
+        greedy_cover(pool, backend="numpy")
+    elif engine == "hybrid":
+        hybrid_greedy(pool, seed=0)
+    elif engine == "chunked":
+        chunked_greedy_cover(pool)
+    elif engine == "fast":
+        fast_greedy_v2(pool, attempts=1, seed=0, workers=1)
+    return (time.perf_counter() - started) * 1000
+
+
+def calibrate(path: str = MODEL_PATH) -> Dict:
+    """Замеряет движки на сплошных пулах и записывает модель в path."""
+    grids = {
+        "lazy": CALIBRATION_V,
+        "numpy": CALIBRATION_V,
+        "hybrid": CALIBRATION_V,
+        "chunked": CALIBRATION_V,
+        "fast": FAST_CALIBRATION_V,
+    }
+    engines = {}
+    for engine, grid in grids.items():
+        points = []
+        for v in grid:
+            ms = _measure(engine, list(range(1, v + 1)))
+            points.append((pool_features(v)["work"], ms))
+            print(f"{engine} v={v}: {ms:.0f} ms")
+        engines[engine] = _fit(points)
+
+    model = {
+        "version": 1,
+        "feature": "candidates * triplets_total",
+        "engines": engines,
+        "memory": {"base": 200.0, "per_triple": 0.14},
+        "calibrated_at": time.strftime("%Y-%m-%d"),
+        "cpu_count": os.cpu_count(),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(model, f, indent=2)
+        f.write("\n")
+
+    load_model.cache_clear()
+    return model
+
+
+if __name__ == "__main__":
+    # python -m services.cost_model
+    parser = argparse.ArgumentParser(description="Calibrate the greedy engine cost model")
+    parser.add_argument("--path", default=MODEL_PATH)
+    args = parser.parse_args()
+    calibrate(args.path)
@@ -0,0 +1,70 @@
+# backend/services/coverage.py
+from __future__ import annotations
+from itertools import combinations
+from math import comb
+from typing import List, Dict, Iterable, Optional
+
+import numpy as np
+
+from .covering import binom_table, colex_rank
+
+
+# ==========================================================
+# Метрика покрытия t-подмножеств пула (t = 2 / 3 / 4)
+# ==========================================================
+# Общая для budget, результатов greedy и загруженных систем.
+# Билеты переводятся в позиции пула, t-подмножества каждого билета
+# кодируются colex-рангом (services/covering.py) одним векторным
+# проходом на шаблон столбцов, покрытые помечаются во флаговом массиве
+# размера C(v, t). Числа билета вне пула не участвуют.
+
+COVERAGE_TS = (2, 3, 4)
+MAX_COVERAGE_T = 6
+
+# Потолок C(v, t): флаговый массив bool на подмножество, ~50 MB
+MAX_SUBSETS = 50_000_000
+
+
+def coverage_metrics(
+    system: List[List[int]],
+    numbers: Optional[List[int]] = None,
+    ts: Iterable[int] = COVERAGE_TS,
+) -> Dict[int, Dict]:
+    """
+    {t: {covered, total, coverage}} для каждого t из ts.
+    numbers — пул; по умолчанию все числа, встречающиеся в system.
+    Если C(v, t) больше MAX_SUBSETS — {"error": ...}.
+    """
+    pool = sorted(set(numbers) if numbers else {n for ticket in system for n in ticket})
+    v = len(pool)
+    ts = sorted(set(t for t in ts if t >= 1))
+    if not ts:
+        return {}
+    if comb(v, ts[-1]) > MAX_SUBSETS:
+        return {"error": f"Too many subsets: C({v}, {ts[-1]}) = {comb(v, ts[-1])} (limit {MAX_SUBSETS})"}
+
+    pos = {n: i for i, n in enumerate(pool)}
+    # Билеты группируем по числу чисел из пула, чтобы собрать матрицы позиций
+    by_size: Dict[int, List[List[int]]] = {}
+    for ticket in system:
+        inside = sorted({pos[n] for n in ticket if n in pos})
+        by_size.setdefault(len(inside), []).append(inside)
+
+    table = binom_table(max(v, 1), max(ts))
+    out: Dict[int, Dict] = {}
+    for t in ts:
+        total = comb(v, t)
+        flags = np.zeros(total, dtype=bool)
+        for size, rows in by_size.items():
+            if size < t:
+                continue
+            positions = np.array(rows, dtype=np.intp)
+            for cols in combinations(range(size), t):
+                flags[colex_rank(positions[:, cols], table)] = True
+        covered = int(flags.sum())
+        out[t] = {
+            "covered": covered,
+            "total": total,
+            "coverage": round(covered / total * 100, 2) if total else 0.0,
+        }
+    return out
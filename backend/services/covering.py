@@ -0,0 +1,254 @@
+# backend/services/covering.py
+from __future__ import annotations
+from itertools import combinations
+from math import comb
+from typing import List, Dict, Tuple, Optional, Callable
+
+import numpy as np
+
+from .greedy_chunked import position_blocks, GENERATE_ROWS
+
+
+# ==========================================================
+# Обобщённое покрытие (v, k, t, m)
+# ==========================================================
+# Колесо из билетов по k чисел из пула v гарантирует: если среди
+# выпавших чисел m попали в пул, то хотя бы один билет содержит
+# t из них (t <= m). Классический случай проекта — k=5, t=m=3.
+#   2-of-6:  k=6, t=2, m=2
+#   4-of-6:  k=6, t=4, m=4
+#   3-if-4:  t=3, m=4
+#
+# Вселенная — все m-подмножества пула, кодируются colex-рангом:
+#   rank({c1 < c2 < ... < cm}) = C(c1, 1) + C(c2, 2) + ... + C(cm, m)
+# (ci — позиции в пуле). Словарь кортежей не строится, ранги считаются
+# векторно по таблице биномов. Билет K покрывает m-подмножество M,
+# если |K ∩ M| >= t: M = (j позиций из K) + (m - j позиций вне K).
+#
+# Ранги покрываемых подмножеств для всех кандидатов лежат в матрице
+# int32 (n, P); выбор — lazy greedy (CELF), ничьи в пользу
+# лексикографически меньшего билета, как в greedy_cover().
+
+DEFAULT_MEMORY_LIMIT_MB = 256
+MAX_UNCOVERED_LISTED = 1000
+_RANK_BLOCK = 4096
+
+# Потолок рабочей памяти одного блока _covered_ranks: при больших P
+# (тысячи подмножеств на билет) блок уменьшается
+_RANK_WORK_BYTES = 32 * 1024 * 1024
+
+# Запись кучи CELF (-gain, i, stamp): слот списка + кортеж + int индекса
+_HEAP_ENTRY_BYTES = 8 + 64 + 28
+
+
+def _rank_rows(v: int, k: int, m: int, P: int) -> Tuple[int, int]:
+    """(строк в блоке _covered_ranks, байт рабочей памяти на строку)."""
+    per_row = v + (v - k) * 8 + P * (m * 16 + 4)
+    return max(1, min(_RANK_BLOCK, _RANK_WORK_BYTES // per_row)), per_row
+
+
+def _memory_estimate(v: int, k: int, m: int, P: int, n: int) -> int:
+    """
+    Пиковая память covering_greedy в байтах для n кандидатов:
+    позиции uint8 (n, k), ранги int32 (n, P), куча CELF, флаги вселенной,
+    рабочие блоки генерации (position_blocks) и _covered_ranks.
+    """
+    generate = GENERATE_ROWS * k * (1 + 8 + 1)
+    rows, per_row = _rank_rows(v, k, m, P)
+    return n * (k + P * 4 + _HEAP_ENTRY_BYTES) + comb(v, m) + generate + rows * per_row
+
+
+def binom_table(v: int, m: int) -> np.ndarray:
+    """Таблица C(n, i) для n < v, i <= m: int64 (v, m + 1)."""
+    table = np.zeros((v, m + 1), dtype=np.int64)
+    for n in range(v):
+        for i in range(m + 1):
+            table[n, i] = comb(n, i)
+    return table
+
+
+def colex_rank(positions: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """Colex-ранги строк отсортированных позиций (..., m)."""
+    m = positions.shape[-1]
+    return table[positions, np.arange(1, m + 1)].sum(axis=-1)
+
+
+def colex_unrank(rank: int, m: int) -> List[int]:
+    """Позиции m-подмножества по colex-рангу (по возрастанию)."""
+    out = []
+    for i in range(m, 0, -1):
+        c = i - 1
+        while comb(c + 1, i) <= rank:
+            c += 1
+        out.append(c)
+        rank -= comb(c, i)
+    return out[::-1]
+
+
+def _cover_patterns(k: int, v: int, t: int, m: int):
+    """Пары (индексы внутри билета, индексы в дополнении) для j = t..min(k, m)."""
+    patterns = []
+    for j in range(t, min(k, m) + 1):
+        if m - j > v - k:
+            continue
+        for inside in combinations(range(k), j):
+            for outside in combinations(range(v - k), m - j):
+                patterns.append((inside, outside))
+    return patterns
+
+
+def sets_per_ticket(v: int, k: int, t: int, m: int) -> int:
+    """Сколько m-подмножеств покрывает один билет."""
+    return sum(comb(k, j) * comb(v - k, m - j) for j in range(t, min(k, m) + 1))
+
+
+def _covered_ranks(
+    tickets: np.ndarray,
+    v: int,
+    patterns,
+    table: np.ndarray,
+) -> np.ndarray:
+    """Ранги m-подмножеств, покрытых каждым билетом: int32 (n, P)."""
+    n, k = tickets.shape
+    out = np.empty((n, len(patterns)), dtype=np.int32)
+
+    # Дополнение билета в пуле, по возрастанию
+    member = np.zeros((n, v), dtype=bool)
+    np.put_along_axis(member, tickets.astype(np.intp), True, axis=1)
+    complement = np.nonzero(~member)[1].reshape(n, v - k)
+
+    # Группируем шаблоны по j, чтобы собирать подмножества одним срезом
+    by_shape: Dict[tuple, List[int]] = {}
+    for col, (ins, outs) in enumerate(patterns):
+        by_shape.setdefault((len(ins), len(outs)), []).append(col)
+
+    for (j, r), cols in by_shape.items():
+        ins_idx = np.array([patterns[c][0] for c in cols], dtype=np.intp).reshape(len(cols), j)
+        outs_idx = np.array([patterns[c][1] for c in cols], dtype=np.intp).reshape(len(cols), r)
+        subsets = np.concatenate(
+            [tickets[:, ins_idx], complement[:, outs_idx]],
+            axis=2,
+        )
+        subsets.sort(axis=2)
+        out[:, cols] = colex_rank(subsets, table)
+    return out
+
+
+def covering_greedy(
+    numbers: List[int],
+    ticket_size: int,
+    guarantee: int,
+    draw_match: Optional[int] = None,
+    memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+    on_event: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Lazy greedy для покрытия (v, k, t, m).
+    ticket_size=k, guarantee=t, draw_match=m (по умолчанию m = t).
+    Кандидаты — k-подмножества пула без 4-в-ряд. Поэтому при t >= 4 и
+    четырёх подряд идущих числах в пуле часть m-подмножеств не покрывает
+    ни один допустимый билет: расчёт останавливается ниже 100% и в ответе
+    есть warning.
+    memory_limit_mb — потолок пиковой памяти (см. _memory_estimate): позиции,
+    матрица рангов (кандидаты x P), куча CELF и флаги вселенной; запрос,
+    который в него не помещается, отклоняется до расчёта.
+    """
+    base = sorted(set(numbers))
+    v = len(base)
+    k, t = ticket_size, guarantee
+    m = t if draw_match is None else draw_match
+
+    if not (1 <= t <= m and 1 <= t <= k):
+        return {"error": "Require 1 <= guarantee <= draw_match and guarantee <= ticket_size"}
+    if v < k or v < m:
+        return {
+            "system": [],
+            "system_size": 0,
+            "coverage": 0.0,
+            "universe_total": 0,
+            "universe_covered": 0,
+            "uncovered_sets": [],
+            "warning": f"Not enough numbers for ticket_size={k}, draw_match={m}"
+        }
+
+    U = comb(v, m)
+    P = sets_per_ticket(v, k, t, m)
+    n_upper = comb(v, k)
+    memory = _memory_estimate(v, k, m, P, n_upper)
+    if memory > memory_limit_mb * 1024 * 1024:
+        return {
+            "error": f"Covering ({v}, {k}, {t}, {m}) needs ~{memory // (1024 * 1024)} MB "
+                     f"for {n_upper} candidates x {P} sets (memory_limit_mb={memory_limit_mb})"
+        }
+
+    # Позиции кандидатов собираем блоками, без списка всех combinations()
+    tickets = np.empty((n_upper, k), dtype=np.uint8)
+    n = 0
+    for rows in position_blocks(np.asarray(base, dtype=np.int64), k):
+        tickets[n:n + rows.shape[0]] = rows
+        n += rows.shape[0]
+    tickets = tickets[:n]
+    if n == 0:
+        return {
+            "system": [],
+            "system_size": 0,
+            "coverage": 0.0,
+            "universe_total": U,
+            "universe_covered": 0,
+            "uncovered_sets": [],
+            "warning": "All candidate combos filtered out (4-in-row rule)."
+        }
+
+    table = binom_table(v, m)
+    patterns = _cover_patterns(k, v, t, m)
+    ranks = np.empty((n, len(patterns)), dtype=np.int32)
+    block, _ = _rank_rows(v, k, m, P)
+    for start in range(0, n, block):
+        ranks[start:start + block] = _covered_ranks(tickets[start:start + block], v, patterns, table)
+
+    from .greedy import _rank_lazy_picks, _ticket_event
+
+    uncovered = np.ones(U, dtype=bool)
+    chosen: List[int] = []
+    covered_so_far = 0
+    stats = {"gain_evaluations": 0}
+
+    for i, gain in _rank_lazy_picks(ranks, uncovered, stats):
+        chosen.append(i)
+        covered_so_far += gain
+        if progress:
+            progress(len(chosen), covered_so_far, U)
+        if on_event:
+            on_event(_ticket_event(len(chosen), [base[p] for p in tickets[i]], gain, covered_so_far, U))
+
+    remaining = U - covered_so_far
+    uncovered_list: List[List[int]] = []
+    if remaining > 0:
+        for r in np.flatnonzero(uncovered)[:MAX_UNCOVERED_LISTED]:
+            uncovered_list.append([base[p] for p in colex_unrank(int(r), m)])
+
+    system = [[base[p] for p in tickets[i]] for i in chosen]
+
+    result = {
+        "system": system,
+        "system_size": len(system),
+        "coverage": round(covered_so_far / U * 100, 2),
+        "universe_total": U,
+        "universe_covered": covered_so_far,
+        "uncovered_sets": uncovered_list,
+        "uncovered_truncated": remaining > len(uncovered_list),
+        "engine": "covering",
+        "ticket_size": k,
+        "guarantee": t,
+        "draw_match": m,
+        "gain_evaluations": stats["gain_evaluations"],
+    }
+    if remaining > 0:
+        # Greedy идёт, пока у кого-то из кандидатов есть прирост, так что
+        # оставшиеся множества покрывают только билеты, отброшенные правилом 4-в-ряд
+        result["warning"] = (
+            f"{remaining} of {U} sets cannot be covered: every ticket covering them "
+            f"has 4 numbers in a row (4-in-row rule), so guarantee={t} does not hold for this pool."
+        )
+    return result
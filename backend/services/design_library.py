@@ -0,0 +1,177 @@
+# backend/services/design_library.py
+from __future__ import annotations
+import argparse
+import base64
+import gzip
+import json
+import os
+import time
+from functools import lru_cache
+from math import comb
+from typing import List, Dict, Optional
+
+from .config import BALL_COUNT
+from .greedy import has_four_in_row
+
+
+# ==========================================================
+# Библиотека готовых покрывающих систем C(v, 5, 3)
+# ==========================================================
+# Система greedy зависит только от размера пула (и от того, где
+# срабатывает правило 4-в-ряд). Поэтому для v = 6..50 храним лучшие
+# найденные системы в позициях 0..v-1 и при запросе переименовываем
+# позиции в числа пользователя.
+#
+# Системы строятся на сплошном пуле 1..v с фильтром 4-в-ряд: у любых
+# других чисел четыре подряд идущих значения могут стоять только на
+# четырёх подряд идущих позициях, поэтому переименованная система правило
+# не нарушает. Проверка при выдаче всё равно выполняется.
+#
+# Формат файла: gzip JSON
+#   {"k": 5, "t": 3, "designs": {"<v>": {"size": N, "source": "...",
+#                                       "blocks": base64(uint8[N * k])}}}
+
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "covering_designs_5_3.json.gz")
+
+LIBRARY_MIN_V = 6
+LIBRARY_MAX_V = 50
+
+# До какого размера пула запускаем anneal поверх greedy при сборке
+ANNEAL_MAX_V = 30
+DEFAULT_BUILD_BUDGET_MS = 5000
+
+
+def _encode_blocks(blocks: List[List[int]]) -> str:
+    return base64.b64encode(bytes(p for b in blocks for p in b)).decode("ascii")
+
+
+def _decode_blocks(data: str, k: int) -> List[tuple]:
+    raw = base64.b64decode(data)
+    return [tuple(raw[i:i + k]) for i in range(0, len(raw), k)]
+
+
+@lru_cache(maxsize=1)
+def _load_library(path: str = LIBRARY_PATH) -> Dict[int, Dict]:
+    """Загружаем библиотеку один раз на процесс. Нет файла — пустая библиотека."""
+    if not os.path.exists(path):
+        return {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("k") != BALL_COUNT or data.get("t") != 3:
+        return {}
+
+    designs = {}
+    for v, entry in data.get("designs", {}).items():
+        designs[int(v)] = {
+            "source": entry.get("source"),
+            "blocks": _decode_blocks(entry["blocks"], BALL_COUNT),
+        }
+    return designs
+
+
+def library_sizes() -> Dict[int, int]:
+    """Размеры систем в библиотеке: {v: число билетов}."""
+    return {v: len(d["blocks"]) for v, d in sorted(_load_library().items())}
+
+
+def lookup_design(numbers: List[int]) -> Optional[Dict]:
+    """
+    Готовая система для пула numbers или None, если в библиотеке
+    нет такого размера или переименование нарушает правило 4-в-ряд.
+    """
+    base = sorted(set(numbers))
+    design = _load_library().get(len(base))
+    if design is None:
+        return None
+
+    system = [[base[p] for p in block] for block in design["blocks"]]
+    if any(has_four_in_row(c) for c in system):
+        return None
+
+    U = comb(len(base), 3)
+    return {
+        "system": system,
+        "system_size": len(system),
+        "coverage": 100.0,
+        "triplets_total": U,
+        "triplets_covered": U,
+        "uncovered_triplets": [],
+        "engine": "library",
+        "source": design["source"],
+    }
+
+
+# ==========================================================
+# Сборка библиотеки
+# ==========================================================
+
+def _build_design(v: int, time_budget_ms: int) -> Optional[Dict]:
+    """
+    Система для сплошного пула 1..v в позициях 0..v-1.
+    None, если на сплошном пуле правило 4-в-ряд не даёт покрыть все тройки
+    (например, v=6: тройку 3-4-5 нельзя взять без четырёх подряд).
+    """
+    from .greedy_anneal import anneal_cover
+    from .greedy_chunked import chunked_greedy_cover
+
+    pool = list(range(1, v + 1))
+    if v <= ANNEAL_MAX_V:
+        res = anneal_cover(pool, time_budget_ms=time_budget_ms, seed=v)
+        source = "anneal"
+    else:
+        res = chunked_greedy_cover(pool)
+        source = "greedy"
+
+    if res.get("coverage") != 100.0:
+        return None
+    return {"blocks": [[n - 1 for n in c] for c in res["system"]], "source": source}
+
+
+def build_library(
+    v_min: int = LIBRARY_MIN_V,
+    v_max: int = LIBRARY_MAX_V,
+    time_budget_ms: int = DEFAULT_BUILD_BUDGET_MS,
+    path: str = LIBRARY_PATH,
+) -> Dict[int, int]:
+    """
+    Считает системы для v_min..v_max и записывает их в path.
+    Уже сохранённые системы заменяются только более короткими.
+    Возвращает {v: размер системы} после сборки.
+    """
+    designs: Dict[str, Dict] = {}
+    if os.path.exists(path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            designs = json.load(f).get("designs", {})
+
+    for v in range(max(v_min, BALL_COUNT + 1), v_max + 1):
+        started = time.perf_counter()
+        built = _build_design(v, time_budget_ms)
+        if built is None:
+            print(f"v={v}: skipped, full coverage impossible on 1..{v}")
+            continue
+        old = designs.get(str(v))
+        if old is None or len(built["blocks"]) < old["size"]:
+            designs[str(v)] = {
+                "size": len(built["blocks"]),
+                "source": built["source"],
+                "blocks": _encode_blocks(built["blocks"]),
+            }
+        print(f"v={v}: {designs[str(v)]['size']} tickets ({time.perf_counter() - started:.1f}s)")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ordered = {str(v): designs[str(v)] for v in sorted(int(x) for x in designs)}
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"k": BALL_COUNT, "t": 3, "designs": ordered}, f, separators=(",", ":"))
+
+    _load_library.cache_clear()
+    return {int(v): d["size"] for v, d in ordered.items()}
+
+
+if __name__ == "__main__":
+    # python -m services.design_library --min 6 --max 50 --time-budget-ms 5000
+    parser = argparse.ArgumentParser(description="Build the covering design library C(v, 5, 3)")
+    parser.add_argument("--min", type=int, default=LIBRARY_MIN_V, dest="v_min")
+    parser.add_argument("--max", type=int, default=LIBRARY_MAX_V, dest="v_max")
+    parser.add_argument("--time-budget-ms", type=int, default=DEFAULT_BUILD_BUDGET_MS)
+    args = parser.parse_args()
+    build_library(args.v_min, args.v_max, args.time_budget_ms)
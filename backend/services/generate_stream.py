@@ -0,0 +1,102 @@
+# backend/services/generate_stream.py
+from __future__ import annotations
+import json
+from itertools import islice
+from typing import Dict, Any, Iterator
+
+from .generator import iter_system
+
+
+# ==========================================================
+# Потоковая выдача /generate: NDJSON / JSON по частям
+# ==========================================================
+# generate_system() собирает весь список комбинаций и отдаёт его одним
+# JSON — на больших пулах это сотни мегабайт и долгое ожидание первого
+# байта. Здесь комбинации берутся прямо из ленивого перебора
+# (generator.iter_system) и уходят клиенту пачками по flush_size, так что
+# память сервера не зависит от размера результата.
+#   fmt="ndjson":
+#     {"event": "start", "numbers_used": [...], "total": C(n, 5)}
+#     {"event": "combinations", "combinations": [[...], ...]}   — пачка
+#     {"event": "done", "count": N}                             — или "error"
+#   fmt="json": тот же документ, что у POST /generate
+#     ({"numbers_used", "combinations", "count"}), только выдаётся по частям.
+# Клиент закрыл соединение — генератор закрывается, перебор останавливается.
+
+STREAM_FORMATS = ("ndjson", "json")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+DEFAULT_FLUSH_SIZE = 1000
+MAX_FLUSH_SIZE = 100_000
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def stream_generate(
+    params: Dict[str, Any],
+    fmt: str = "ndjson",
+    flush_size: int = DEFAULT_FLUSH_SIZE,
+) -> Iterator[str]:
+    """
+    Подготавливает перебор generate_system(**params) и возвращает генератор
+    частей ответа. offset / page_size / sample / seed — как у generate_system,
+    только page_size не ограничивается MAX_PAGE_SIZE: поток и нужен для
+    больших выдач.
+    Ошибки входных данных бросаются сразу (до первого байта),
+    ошибки во время перебора уходят в поток как "error".
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Unknown stream format: {fmt}")
+    flush_size = max(1, min(int(flush_size), MAX_FLUSH_SIZE))
+
+    params = dict(params)
+    if params.pop("count_only", False):
+        raise ValueError("count_only is not streamed, use POST /generate")
+    page_size = params.pop("page_size", None)
+    if page_size is not None and page_size < 1:
+        raise ValueError("page_size must be >= 1")
+    limit = page_size or params.pop("limit", None)
+    params.pop("limit", None)
+    offset = max(0, params.pop("offset", None) or 0)
+    numbers, total, combos = iter_system(**params, offset=offset)
+    if limit and not params.get("sample"):
+        combos = islice(combos, limit)
+
+    if fmt == "ndjson":
+        return _ndjson(numbers, total, combos, flush_size)
+    return _json(numbers, combos, flush_size)
+
+
+def _ndjson(numbers, total, combos, flush_size: int) -> Iterator[str]:
+    yield _dumps({"event": "start", "numbers_used": numbers, "total": total}) + "\n"
+    count = 0
+    try:
+        while True:
+            chunk = [list(c) for c in islice(combos, flush_size)]
+            if not chunk:
+                break
+            count += len(chunk)
+            yield _dumps({"event": "combinations", "combinations": chunk}) + "\n"
+    except Exception as e:
+        yield _dumps({"event": "error", "error": str(e), "count": count}) + "\n"
+        return
+    yield _dumps({"event": "done", "count": count}) + "\n"
+
+
+def _json(numbers, combos, flush_size: int) -> Iterator[str]:
+    yield '{"numbers_used":' + _dumps(numbers) + ',"combinations":['
+    count = 0
+    try:
+        while True:
+            chunk = list(islice(combos, flush_size))
+            if not chunk:
+                break
+            part = ",".join(_dumps(list(c)) for c in chunk)
+            yield ("," if count else "") + part
+            count += len(chunk)
+    except Exception as e:
+        yield '],"count":' + str(count) + ',"error":' + _dumps(str(e)) + "}"
+        return
+    yield '],"count":' + str(count) + "}"
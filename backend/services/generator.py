@@ -1,4 +1,5 @@
-from itertools import combinations
+import random
+from math import comb
 from services.config import (
     BALL_MIN,
     BALL_MAX,
@@ -8,6 +9,12 @@ from services.config import (
 )
 
 
+PROGRESS_EVERY = 4096
+
+# Largest page generate_system returns in paged mode
+MAX_PAGE_SIZE = 10_000
+
+
 def has_four_in_row(combo):
     """Disallow sequences like 7,8,9,10."""
     for i in range(len(combo) - 3):
@@ -103,9 +110,257 @@ def passes_group_limits(combo, number_to_group, group_limits):
     return True
 
 
-def generate_system(
+def _build_plan(
+    numbers,
+    fixed_positions,
+    forced_numbers,
+    number_to_group,
+    group_limits,
+    range_mode,
+    min_num,
+    max_num,
+    per_ball_ranges,
+):
+    """
+    Translate the filters into per-position constraints over pool indices
+    for the backtracking walk. Returns None when no combination can pass.
+    """
+    n = len(numbers)
+
+    # allowed[pos][i]: numbers[i] may stand at position pos
+    allowed = [[True] * n for _ in range(BALL_COUNT)]
+
+    if range_mode == "global":
+        for i, x in enumerate(numbers):
+            if not passes_global_range([x], min_num, max_num):
+                for row in allowed:
+                    row[i] = False
+
+    if range_mode == "perball" and per_ball_ranges:
+        for pos in range(BALL_COUNT):
+            r = per_ball_ranges.get(pos)
+            if not r:
+                continue
+            mn = r.get("min")
+            mx = r.get("max")
+            row = allowed[pos]
+            for i, x in enumerate(numbers):
+                if (mn is not None and x < mn) or (mx is not None and x > mx):
+                    row[i] = False
+
+    if fixed_positions:
+        for pos, values in fixed_positions.items():
+            try:
+                pos = int(pos)
+            except (TypeError, ValueError):
+                return None
+            if pos < 0 or pos >= BALL_COUNT:
+                return None
+            row = allowed[pos]
+            for i, x in enumerate(numbers):
+                if x not in values:
+                    row[i] = False
+
+    # forced numbers as sorted pool indices
+    forced = []
+    if forced_numbers:
+        index = {x: i for i, x in enumerate(numbers)}
+        for x in set(forced_numbers):
+            if x not in index:
+                return None
+            forced.append(index[x])
+        forced.sort()
+        if len(forced) > BALL_COUNT:
+            return None
+
+    # group_of[i]: slot of the limited group numbers[i] belongs to
+    group_of = [None] * n
+    caps = []
+    if number_to_group and group_limits:
+        slots = {}
+        for g, limit in group_limits.items():
+            if limit is None:
+                continue
+            if limit < 0:
+                return None
+            slots[g] = len(caps)
+            caps.append(limit)
+        for i, x in enumerate(numbers):
+            g = number_to_group.get(x)
+            if g and g in slots:
+                group_of[i] = slots[g]
+
+    return {
+        "numbers": numbers,
+        "allowed": allowed,
+        "forced": forced,
+        "group_of": group_of,
+        "caps": caps,
+        "used": (0,) * len(caps),
+    }
+
+
+def _choices(plan, depth, start, taken, run, used):
+    """
+    Admissible pool indices for position depth after a prefix that ends at
+    index start - 1. The prefix state is (taken, run, used):
+      taken - forced numbers already in the prefix,
+      run   - length of the consecutive run the prefix ends with,
+      used  - tuple of per-group counts.
+    Yields (i, taken, run, used) for the prefix extended by numbers[i].
+    A choice is rejected when the number is not allowed at this position,
+    completes four in a row, exceeds a group limit, or leaves more forced
+    numbers than positions; past the next forced number nothing can pass.
+    """
+    numbers = plan["numbers"]
+    allowed = plan["allowed"][depth]
+    forced = plan["forced"]
+    group_of = plan["group_of"]
+    caps = plan["caps"]
+
+    n = len(numbers)
+    nf = len(forced)
+    slots = BALL_COUNT - depth - 1
+    need = forced[taken] if taken < nf else n
+    prev = numbers[start - 1] if depth else None
+
+    for i in range(start, min(n - slots, need + 1)):
+        if not allowed[i]:
+            continue
+
+        hit = taken + (i == need)
+        if nf - hit > slots:
+            continue
+
+        step = run + 1 if depth and numbers[i] == prev + 1 else 1
+        if step >= 4:
+            continue
+
+        g = group_of[i]
+        if g is None:
+            yield i, hit, step, used
+        elif used[g] < caps[g]:
+            yield i, hit, step, used[:g] + (used[g] + 1,) + used[g + 1:]
+
+
+def _counter(plan):
+    """
+    count(depth, start, taken, run, used) - number of valid completions of a
+    prefix (see _choices), memoized on the prefix state.
+    count(0, 0, 0, 0, plan["used"]) is the size of the whole valid set.
+    """
+    memo = {}
+
+    def count(depth, start, taken, run, used):
+        if depth == BALL_COUNT:
+            return 1
+        key = (depth, start, taken, run, used)
+        found = memo.get(key)
+        if found is None:
+            found = 0
+            for i, hit, step, after in _choices(plan, depth, start, taken, run, used):
+                found += count(depth + 1, i + 1, hit, step, after)
+            memo[key] = found
+        return found
+
+    return count
+
+
+def _walk(plan, tick, offset=0, count=None):
+    """
+    Depth-first walk over the plan in lexicographic order, yielding the
+    combinations that pass every filter; subtrees whose prefix already fails
+    are never expanded. tick(k) gets the number of combinations visited or
+    skipped, so the totals add up to C(n, BALL_COUNT).
+    offset > 0 skips that many valid combinations; with count (see _counter)
+    whole subtrees are skipped by their size instead of being walked.
+    """
+    numbers = plan["numbers"]
+    n = len(numbers)
+    combo = [None] * BALL_COUNT
+    skip = offset or 0
+
+    def descend(depth, start, taken, run, used):
+        nonlocal skip
+        slots = BALL_COUNT - depth - 1
+        cursor = start
+        done = 0    # checked/skipped in this frame, not yet passed to tick
+
+        for i, hit, step, after in _choices(plan, depth, start, taken, run, used):
+            # rejected indices between the previous choice and this one
+            if i != cursor:
+                done += comb(n - cursor, slots + 1) - comb(n - i, slots + 1)
+            cursor = i + 1
+
+            if skip and count is not None:
+                size = count(depth + 1, i + 1, hit, step, after)
+                if skip >= size:
+                    skip -= size
+                    done += comb(n - i - 1, slots)
+                    continue
+
+            combo[depth] = numbers[i]
+            if slots == 0:
+                done += 1
+                if skip:
+                    skip -= 1
+                    continue
+                yield tuple(combo)
+                continue
+
+            if done:
+                tick(done)
+                done = 0
+            yield from descend(depth + 1, i + 1, hit, step, after)
+
+        tick(done + comb(n - cursor, slots + 1))
+
+    return descend(0, 0, 0, 0, plan["used"])
+
+
+def _unrank(plan, count, rank):
+    """
+    The valid combination with index rank (0-based, lexicographic order):
+    at each position take the choice whose subtree count contains rank.
+    """
+    numbers = plan["numbers"]
+    combo = []
+    start, taken, run, used = 0, 0, 0, plan["used"]
+
+    for depth in range(BALL_COUNT):
+        for i, hit, step, after in _choices(plan, depth, start, taken, run, used):
+            size = count(depth + 1, i + 1, hit, step, after)
+            if rank < size:
+                break
+            rank -= size
+        else:
+            raise IndexError("rank out of range")
+        combo.append(numbers[i])
+        start, taken, run, used = i + 1, hit, step, after
+
+    return tuple(combo)
+
+
+def _draw_seed():
+    """Concrete seed for an unseeded draw, so the response can replay it."""
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def _sample(plan, count, size, seed):
+    """
+    size distinct valid combinations drawn uniformly at random (fewer if the
+    valid set is smaller), in lexicographic order. Ranks are sampled from
+    range(total_valid) and unranked one by one, so the cost grows with size,
+    not with the number of combinations.
+    """
+    total_valid = count(0, 0, 0, 0, plan["used"])
+    ranks = random.Random(seed).sample(range(total_valid), min(size, total_valid))
+    for rank in sorted(ranks):
+        yield _unrank(plan, count, rank)
+
+
+def _prepare(
     numbers,
-    limit=None,
     fixed_positions=None,
     groups=None,
     group_limits=None,
@@ -116,7 +371,9 @@ def generate_system(
     per_ball_ranges=None,
 ):
     """
-    Main generator with full filtering support.
+    Normalize the input and build the plan.
+    Returns (numbers_used, total, plan) with total = C(n, BALL_COUNT);
+    plan is None when no combination can pass.
     """
 
        # ---------- NORMALIZE INPUT ----------
@@ -145,39 +402,167 @@ def generate_system(
             for n in nums:
                 number_to_group[n] = label
 
-    valid = []
+    total = comb(len(numbers), BALL_COUNT)
 
-    # ---------- GENERATION LOOP ----------
+    plan = _build_plan(
+        numbers,
+        fixed_positions,
+        forced_numbers,
+        number_to_group,
+        group_limits,
+        range_mode,
+        min_num,
+        max_num,
+        per_ball_ranges,
+    )
 
-    for combo in combinations(numbers, BALL_COUNT):
+    return numbers, total, plan
 
-        if has_four_in_row(combo):
-            continue
 
-        if range_mode == "global":
-            if not passes_global_range(combo, min_num, max_num):
-                continue
+def iter_system(*args, offset=0, tick=None, sample=None, seed=None, **kwargs):
+    """
+    Lazy variant of generate_system (same filter arguments).
+    Returns (numbers_used, total, combinations) where combinations iterates
+    the valid combinations as tuples in lexicographic order, starting after
+    the first offset of them. tick(k) receives the number of combinations
+    checked or skipped.
+    sample=N iterates N uniformly sampled combinations instead (see _sample).
+    """
+    numbers, total, plan = _prepare(*args, **kwargs)
 
-        if range_mode == "perball":
-            if not passes_per_ball_range(combo, per_ball_ranges):
-                continue
+    if plan is None:
+        return numbers, total, iter(())
 
-        if not passes_fixed_positions(combo, fixed_positions):
-            continue
+    if sample:
+        if seed is None:
+            seed = _draw_seed()
+        return numbers, total, _sample(plan, _counter(plan), sample, seed)
 
-        if not passes_forced_numbers(combo, forced_numbers):
-            continue
+    count = _counter(plan) if offset else None
+    return numbers, total, _walk(plan, tick or (lambda k: None), offset, count)
 
-        if not passes_group_limits(combo, number_to_group, group_limits):
-            continue
 
-        valid.append(list(combo))
+def generate_system(
+    numbers,
+    limit=None,
+    fixed_positions=None,
+    groups=None,
+    group_limits=None,
+    forced_numbers=None,
+    range_mode="global",
+    min_num=None,
+    max_num=None,
+    per_ball_ranges=None,
+    progress=None,
+    offset=None,
+    page_size=None,
+    count_only=False,
+    sample=None,
+    seed=None,
+):
+    """
+    Main generator with full filtering support.
+    Combinations are enumerated depth-first with the filters applied per
+    position, so subtrees that cannot pass are never expanded; the output
+    is the same lexicographic list the filters would leave.
+    progress(checked, found, total) is called every PROGRESS_EVERY combinations
+    (skipped subtrees count as checked).
+
+    Pagination: offset / page_size return valid combinations
+    [offset, offset + page_size) of that list (page_size falls back to limit,
+    then to MAX_PAGE_SIZE, and is capped at MAX_PAGE_SIZE; below 1 is a
+    ValueError).
+    The walk seeks to offset by subtree counts, so a page costs about its own
+    size; the response then also carries total_valid and next_offset.
+
+    count_only=True returns just the exact number of valid combinations,
+    counted over prefix states without enumerating them (limit is ignored).
+
+    sample=N returns N distinct valid combinations drawn uniformly at random
+    (all of them if fewer exist), in lexicographic order; seed makes the draw
+    reproducible (without one a random seed is drawn and returned). Each one is unranked from a random index, so the cost grows
+    with N rather than with the pool.
+    """
+    valid = []
+    checked = 0
+
+    def tick(k):
+        nonlocal checked
+        before = checked
+        checked += k
+        if progress and checked // PROGRESS_EVERY != before // PROGRESS_EVERY:
+            progress(checked, len(valid), total)
+
+    numbers, total, plan = _prepare(
+        numbers,
+        fixed_positions=fixed_positions,
+        groups=groups,
+        group_limits=group_limits,
+        forced_numbers=forced_numbers,
+        range_mode=range_mode,
+        min_num=min_num,
+        max_num=max_num,
+        per_ball_ranges=per_ball_ranges,
+    )
+
+    if count_only:
+        total_valid = _counter(plan)(0, 0, 0, 0, plan["used"]) if plan is not None else 0
+        return {
+            "count": total_valid,
+            "numbers_used": numbers,
+            "combinations": [],
+            "count_only": True,
+            "total_valid": total_valid,
+            "total_combinations": total,
+        }
+
+    if sample:
+        # one seed per request: draw one when none is given and return it
+        if seed is None:
+            seed = _draw_seed()
+        count = _counter(plan) if plan is not None else None
+        sampled = [list(c) for c in _sample(plan, count, sample, seed)] if count else []
+        return {
+            "count": len(sampled),
+            "numbers_used": numbers,
+            "combinations": sampled,
+            "sample": sample,
+            "seed": seed,
+            "total_valid": count(0, 0, 0, 0, plan["used"]) if count else 0,
+        }
+
+    paged = offset is not None or page_size is not None
+    offset = max(0, offset or 0)
+    if paged:
+        if page_size is not None and page_size < 1:
+            raise ValueError("page_size must be >= 1")
+        limit = min(page_size or limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+
+    count = _counter(plan) if plan is not None and paged else None
 
-        if limit and len(valid) >= limit:
-            break
+    # ---------- GENERATION LOOP ----------
 
-    return {
+    if plan is not None:
+        for combo in _walk(plan, tick, offset, count):
+            valid.append(list(combo))
+
+            if limit and len(valid) >= limit:
+                break
+
+    result = {
         "count": len(valid),
         "numbers_used": numbers,
         "combinations": valid,
     }
+
+    if paged:
+        total_valid = count(0, 0, 0, 0, plan["used"]) if count else 0
+        end = offset + len(valid)
+        result.update({
+            "offset": offset,
+            "page_size": limit,
+            "total_valid": total_valid,
+            "next_offset": end if end < total_valid else None,
+        })
+
+    return result
@@ -1,9 +1,44 @@
 # backend/services/greedy.py
 from __future__ import annotations
+import heapq
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from itertools import combinations
-from typing import List, Dict, Tuple, Iterable
+from math import comb
+from multiprocessing import shared_memory
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional, Callable
+
+import numpy as np
 
 from .config import BALL_COUNT
+from . import bitset
+from .greedy_chunked import chunked_greedy_cover, DEFAULT_MEMORY_LIMIT_MB
+from .candidate_cache import candidate_set, candidate_masks, candidate_words, relabel
+from .coverage import coverage_metrics
+
+
+# progress(done, covered, total): вызывается движками после каждого шага
+# (выбранный билет, попытка и т.п.). Может бросить исключение, чтобы
+# прервать расчёт — так работает отмена фоновых задач (services/jobs.py).
+ProgressFn = Callable[[int, int, int], None]
+
+# on_event(event): подробные события для потоковой выдачи (services/greedy_stream.py):
+#   {"event": "ticket", "step", "ticket", "gain", "covered", "total", "coverage"}
+#   {"event": "best", "system", "system_size", "coverage", ...}
+EventFn = Callable[[Dict], None]
+
+
+def _ticket_event(step: int, ticket, gain: int, covered: int, total: int) -> Dict:
+    return {
+        "event": "ticket",
+        "step": step,
+        "ticket": [int(n) for n in ticket],
+        "gain": int(gain),
+        "covered": int(covered),
+        "total": total,
+        "coverage": round(covered / total * 100, 2) if total else 0.0,
+    }
 
 
 # ==========================================================
@@ -23,31 +58,206 @@ def has_four_in_row(combo: Iterable[int]) -> bool:
     return False
 
 
-def _build_triple_universe(numbers: List[int]) -> Tuple[List[Tuple[int,int,int]], Dict[Tuple[int,int,int], int]]:
-    """Вселенная троек для заданного набора чисел."""
-    nums = sorted(set(numbers))
-    all_triples = list(combinations(nums, 3))
-    triple_index = {t: i for i, t in enumerate(all_triples)}
-    return all_triples, triple_index
+# ==========================================================
+# Greedy-движки: генераторы выбранных билетов
+# ==========================================================
+# Каждый движок получает маски кандидатов и размер вселенной U и
+# по одному отдаёт (idx, gain) выбранных билетов. Ничья по приросту
+# разрешается в пользу меньшего idx — так все движки дают одну и ту же
+# систему. stats["gain_evaluations"] считает вычисления прироста.
 
+def _classic_picks(masks: List[int], U: int, stats: Dict) -> Iterator[Tuple[int, int]]:
+    """Полный перебор всех масок на каждой итерации."""
+    uncovered_mask = (1 << U) - 1
 
-def _mask_for_combo(combo: Tuple[int, ...], triple_index: Dict[Tuple[int,int,int], int]) -> int:
-    """Битовая маска троек, которые покрывает combo."""
-    m = 0
-    for tri in combinations(combo, 3):
-        idx = triple_index.get(tri)
-        if idx is not None:
-            m |= (1 << idx)
-    return m
+    # Жадный цикл: на каждом шаге выбираем билет с максимальным приростом
+    while uncovered_mask:
+        best_idx = None
+        best_gain = 0
+
+        for idx, m in enumerate(masks):
+            gain = (m & uncovered_mask).bit_count()
+            if gain > best_gain:
+                best_gain = gain
+                best_idx = idx
+        stats["gain_evaluations"] += len(masks)
+
+        if best_idx is None or best_gain == 0:
+            break
+
+        yield best_idx, best_gain
+        uncovered_mask &= ~masks[best_idx]
+
+
+def _lazy_picks(masks: List[int], U: int, stats: Dict) -> Iterator[Tuple[int, int]]:
+    """
+    Lazy greedy (CELF): max-heap устаревших верхних оценок прироста.
+    Прирост билета только убывает, поэтому пересчитываем его лишь когда
+    билет оказался на вершине кучи. Запись (-gain, idx, stamp) считается
+    свежей, если stamp совпадает с номером текущего шага.
+    """
+    uncovered_mask = (1 << U) - 1
+    heap = [(-m.bit_count(), idx, 0) for idx, m in enumerate(masks)]
+    stats["gain_evaluations"] += len(masks)
+    heapq.heapify(heap)
+
+    step = 0
+    while uncovered_mask and heap:
+        neg_gain, idx, stamp = heap[0]
+
+        if stamp == step:
+            heapq.heappop(heap)
+            if neg_gain == 0:
+                break
+            yield idx, -neg_gain
+            uncovered_mask &= ~masks[idx]
+            step += 1
+            continue
+
+        gain = (masks[idx] & uncovered_mask).bit_count()
+        stats["gain_evaluations"] += 1
+        if gain == 0:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (-gain, idx, step))
+
+
+def _rank_lazy_picks(ranks: np.ndarray, uncovered: np.ndarray, stats: Dict) -> Iterator[Tuple[int, int]]:
+    """
+    Lazy greedy (CELF) над матрицей рангов: строка ranks[i] — индексы
+    множеств, которые покрывает кандидат i, uncovered — флаги непокрытых.
+    Выдаёт (idx, gain) как _lazy_picks; тройки/множества выбранного
+    кандидата снимаются из uncovered до выдачи. Общий для covering_greedy
+    и extend_system; ничьи — в пользу меньшего индекса.
+    """
+    n, per_row = ranks.shape
+    heap = [(-per_row, i, -1) for i in range(n)]
+    remaining = int(uncovered.sum())
+
+    step = 0
+    while heap and remaining:
+        neg_gain, i, stamp = heap[0]
+        if stamp == step:
+            heapq.heappop(heap)
+            uncovered[ranks[i]] = False
+            remaining += neg_gain
+            step += 1
+            yield i, -neg_gain
+            continue
+
+        gain = int(uncovered[ranks[i]].sum())
+        stats["gain_evaluations"] += 1
+        if gain == 0:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (-gain, i, step))
+
+
+def _index_picks(masks: List[int], U: int, stats: Dict) -> Iterator[Tuple[int, int]]:
+    """
+    Greedy на инвертированном индексе тройка -> билеты.
+    Индекс строится один раз; когда тройка покрывается, уменьшаем прирост
+    только у билетов, которые её содержат. Следующий argmax берём из
+    корзин по значению прироста (в корзине — min-heap индексов, устаревшие
+    записи отбрасываются при извлечении), поэтому шаг стоит O(изменений),
+    а не O(кандидатов).
+    """
+    n = len(masks)
+    gains = [m.bit_count() for m in masks]
+    stats["gain_evaluations"] += n
+
+    tickets_by_triple: List[List[int]] = [[] for _ in range(U)]
+    for idx, m in enumerate(masks):
+        x = m
+        while x:
+            lsb = x & -x
+            tickets_by_triple[lsb.bit_length() - 1].append(idx)
+            x ^= lsb
+
+    top = max(gains, default=0)
+    # индексы добавляются по возрастанию — каждая корзина уже валидная куча
+    buckets: List[List[int]] = [[] for _ in range(top + 1)]
+    for idx, g in enumerate(gains):
+        buckets[g].append(idx)
+
+    covered = bytearray(U)
+    picked = bytearray(n)
+    heappush, heappop = heapq.heappush, heapq.heappop
+
+    while top > 0:
+        bucket = buckets[top]
+        while bucket and (picked[bucket[0]] or gains[bucket[0]] != top):
+            heappop(bucket)
+        if not bucket:
+            top -= 1
+            continue
+
+        idx = heappop(bucket)
+        yield idx, top
+        picked[idx] = 1
+
+        updates = 0
+        x = masks[idx]
+        while x:
+            lsb = x & -x
+            tri = lsb.bit_length() - 1
+            x ^= lsb
+            if covered[tri]:
+                continue
+            covered[tri] = 1
+            for j in tickets_by_triple[tri]:
+                if picked[j]:
+                    continue
+                g = gains[j] - 1
+                gains[j] = g
+                updates += 1
+                if g > 0:
+                    heappush(buckets[g], j)
+        stats["gain_evaluations"] += updates
+
+
+GREEDY_ENGINES = {
+    "classic": _classic_picks,
+    "lazy": _lazy_picks,
+    "index": _index_picks,
+}
+
+# Представление масок: "int" — Python int на билет,
+# "numpy" — один массив (n, ceil(U/64)) uint64 (см. services/bitset.py)
+MASK_BACKENDS = ("int", "numpy")
+
+
+def _engine_error(engine: str, backend: str) -> Optional[str]:
+    """Текст ошибки для недопустимой пары (engine, backend) greedy_cover или None."""
+    if engine not in GREEDY_ENGINES:
+        return f"Unknown greedy engine: {engine}"
+    if backend not in MASK_BACKENDS:
+        return f"Unknown mask backend: {backend}"
+    if backend == "numpy" and engine != "classic":
+        return "numpy backend supports only engine='classic'"
+    return None
 
 
 # ==========================================================
 # Classic Greedy (битмасочный)
 # ==========================================================
 
-def greedy_cover(numbers: List[int]) -> Dict:
+def greedy_cover(
+    numbers: List[int],
+    engine: str = "classic",
+    backend: str = "int",
+    progress: Optional[ProgressFn] = None,
+    on_event: Optional[EventFn] = None
+) -> Dict:
     """
     Классический битмасочный greedy для покрытия троек C(n, BALL_COUNT, 3).
+    engine:
+      "classic" — полный перебор масок на каждом шаге
+      "lazy"    — CELF (ленивый greedy), та же система, в разы меньше popcount
+      "index"   — инвертированный индекс тройка -> билеты + корзины приростов
+    backend:
+      "int"     — маски как Python int
+      "numpy"   — uint64-битсеты, векторный классический цикл (engine="classic")
     Возвращает:
       {
         system: [[...], ...],
@@ -55,9 +265,16 @@ def greedy_cover(numbers: List[int]) -> Dict:
         coverage: float,
         triplets_total: int,
         triplets_covered: int,
-        uncovered_triplets: [...]
+        uncovered_triplets: [...],
+        engine: str,
+        gain_evaluations: int   # сколько раз считали прирост (popcount)
       }
     """
+    error = _engine_error(engine, backend)
+    if error:
+        return {"error": error}
+    picker = GREEDY_ENGINES[engine]
+
     base = sorted(set(numbers))
     if len(base) < BALL_COUNT:
         return {
@@ -70,8 +287,8 @@ def greedy_cover(numbers: List[int]) -> Dict:
             "warning": f"Not enough numbers for BALL_COUNT={BALL_COUNT}"
         }
 
-    all_triples, triple_index = _build_triple_universe(base)
-    U = len(all_triples)
+    cands = candidate_set(base)
+    U = cands["U"]
     if U == 0:
         return {
             "system": [],
@@ -82,10 +299,7 @@ def greedy_cover(numbers: List[int]) -> Dict:
             "uncovered_triplets": []
         }
 
-    combos = [
-        c for c in combinations(base, BALL_COUNT)
-        if not has_four_in_row(c)
-    ]
+    combos = relabel(base, cands["positions"])
     if not combos:
         return {
             "system": [],
@@ -93,31 +307,29 @@ def greedy_cover(numbers: List[int]) -> Dict:
             "coverage": 0.0,
             "triplets_total": U,
             "triplets_covered": 0,
-            "uncovered_triplets": [list(t) for t in all_triples],
+            "uncovered_triplets": [list(t) for t in combinations(base, 3)],
             "warning": "All candidate combos filtered out (4-in-row rule)."
         }
 
-    masks = [_mask_for_combo(c, triple_index) for c in combos]
+    stats = {"gain_evaluations": 0}
+    if backend == "numpy":
+        picks = bitset.greedy_picks(candidate_words(base), U, stats)
+    else:
+        masks = candidate_masks(base)
+        picks = picker(masks, U, stats)
 
     uncovered_mask = (1 << U) - 1
     chosen: List[Tuple[int, ...]] = []
+    covered_so_far = 0
 
-    # Жадный цикл: на каждом шаге выбираем билет с максимальным приростом
-    while uncovered_mask:
-        best_idx = None
-        best_gain = 0
-
-        for idx, m in enumerate(masks):
-            gain = (m & uncovered_mask).bit_count()
-            if gain > best_gain:
-                best_gain = gain
-                best_idx = idx
-
-        if best_idx is None or best_gain == 0:
-            break
-
-        chosen.append(combos[best_idx])
-        uncovered_mask &= ~masks[best_idx]
+    for idx, gain in picks:
+        chosen.append(combos[idx])
+        uncovered_mask &= ~_mask_from_ranks(cands["ranks"][idx])
+        covered_so_far += gain
+        if progress:
+            progress(len(chosen), covered_so_far, U)
+        if on_event:
+            on_event(_ticket_event(len(chosen), combos[idx], gain, covered_so_far, U))
 
     remaining = uncovered_mask.bit_count()
     covered = U - remaining
@@ -125,7 +337,7 @@ def greedy_cover(numbers: List[int]) -> Dict:
 
     uncovered_list: List[List[int]] = []
     if remaining > 0:
-        for i, tri in enumerate(all_triples):
+        for i, tri in enumerate(combinations(base, 3)):
             if (uncovered_mask >> i) & 1:
                 uncovered_list.append(list(tri))
 
@@ -135,7 +347,10 @@ def greedy_cover(numbers: List[int]) -> Dict:
         "coverage": coverage,
         "triplets_total": U,
         "triplets_covered": covered,
-        "uncovered_triplets": uncovered_list
+        "uncovered_triplets": uncovered_list,
+        "engine": engine,
+        "backend": backend,
+        "gain_evaluations": stats["gain_evaluations"],
     }
 
 
@@ -143,26 +358,19 @@ def greedy_cover(numbers: List[int]) -> Dict:
 # Fast Greedy v2.1 — AI-weighted, оптимизированный
 # ==========================================================
 
-def _build_rarity_weights(triple_index: Dict[Tuple[int,int,int], int],
-                          combos: List[Tuple[int, ...]]) -> List[float]:
+def _build_rarity_weights(ranks: np.ndarray, U: int) -> List[int]:
     """
-    Строим rarity для каждой тройки и возвращаем веса:
-    weight[i] = 1 / rarity[i]
+    Строим rarity для каждой тройки (сколько кандидатов её покрывают)
+    и возвращаем веса: weight[i] = round(RARITY_SCALE / rarity[i])
+    (целые, см. bitset.RARITY_SCALE)
     """
-    U = len(triple_index)
-    rarity = [0] * U
-    for cb in combos:
-        for tri in combinations(cb, 3):
-            idx = triple_index.get(tri)
-            if idx is not None:
-                rarity[idx] += 1
-    weights = [1.0 / max(r, 1) for r in rarity]
-    return weights
-
-
-def _ai_weight_for_mask(mask: int, weights: List[float], uncovered_mask: int) -> float:
+    rarity = np.maximum(np.bincount(ranks.ravel(), minlength=U), 1)
+    return ((bitset.RARITY_SCALE + rarity // 2) // rarity).tolist()
+
+
+def _ai_weight_for_mask(mask: int, weights: List[int], uncovered_mask: int) -> int:
     """
-    Вес билета:
+    Вес билета (целый, в единицах bitset.RARITY_SCALE):
       + количество новых троек
       + бонус за редкие тройки (по weights)
     Оптимизировано: проходим только по установленным битам gained_mask.
@@ -170,9 +378,9 @@ def _ai_weight_for_mask(mask: int, weights: List[float], uncovered_mask: int) ->
     gained = mask & uncovered_mask
     g = gained.bit_count()
     if g == 0:
-        return 0.0
+        return 0
 
-    rare_bonus = 0.0
+    rare_bonus = 0
     x = gained
     while x:
         lsb = x & -x
@@ -180,29 +388,178 @@ def _ai_weight_for_mask(mask: int, weights: List[float], uncovered_mask: int) ->
         rare_bonus += weights[idx]
         x ^= lsb
 
-    return g + rare_bonus
+    return g * bitset.RARITY_SCALE + rare_bonus
+
+
+def _weighted_sample_greedy(s_masks: List[int], weights: List[int], U: int) -> Tuple[List[int], int]:
+    """
+    Greedy по сэмплу с AI-весами (int-маски).
+    Возвращает (локальные индексы выбранных билетов, число непокрытых троек).
+    """
+    uncovered_mask = (1 << U) - 1
+    chosen_local: List[int] = []
+
+    while uncovered_mask:
+        best_local_idx = None
+        best_score = 0
+
+        for local_idx, m in enumerate(s_masks):
+            sc = _ai_weight_for_mask(m, weights, uncovered_mask)
+            if sc > best_score:
+                best_score = sc
+                best_local_idx = local_idx
+
+        if best_local_idx is None or best_score <= 0:
+            break
+
+        chosen_local.append(best_local_idx)
+        uncovered_mask &= ~s_masks[best_local_idx]
+
+    return chosen_local, uncovered_mask.bit_count()
+
+
+def _attempt_seeds(seed: int, attempts: int) -> List[int]:
+    """Детерминированный seed для каждой попытки (независимые потоки SeedSequence)."""
+    children = np.random.SeedSequence(seed).spawn(attempts)
+    return [int(c.generate_state(1)[0]) for c in children]
+
+
+def _mask_from_ranks(row: np.ndarray) -> int:
+    m = 0
+    for r in row.tolist():
+        m |= (1 << r)
+    return m
+
+
+def _run_fast_attempt(
+    ranks: np.ndarray,
+    weights: np.ndarray,
+    ranked: np.ndarray,
+    sample_size: int,
+    U: int,
+    backend: str,
+    seed: int,
+) -> Tuple[List[int], int]:
+    """
+    Одна попытка Fast Greedy: сэмпл (лучшие + случайные) и greedy по нему.
+    Возвращает (индексы выбранных кандидатов, число непокрытых троек).
+    """
+    rng = random.Random(seed)
+
+    # Семплирование: половина лучших + половина случайных
+    top_cut = max(50, sample_size // 2)
+    top_cut = min(top_cut, sample_size, len(ranked))
+
+    top_part = ranked[:top_cut].tolist()
+    remaining_count = len(ranked) - top_cut
+
+    random_part_count = sample_size - len(top_part)
+    if remaining_count > 0 and random_part_count > 0:
+        picks = rng.sample(range(remaining_count), min(random_part_count, remaining_count))
+        random_part = ranked[top_cut:][picks].tolist()
+    else:
+        random_part = []
+
+    sampled_idx = top_part + random_part
+
+    # Greedy цикл по сэмплу
+    s_ranks = ranks[sampled_idx]
+    if backend == "numpy":
+        chosen_local, remaining = bitset.weighted_greedy(s_ranks, weights, U)
+    else:
+        s_masks = [_mask_from_ranks(row) for row in s_ranks]
+        chosen_local, remaining = _weighted_sample_greedy(s_masks, weights.tolist(), U)
+
+    return [sampled_idx[i] for i in chosen_local], remaining
+
+
+def _fast_attempt_worker(shared: Dict, sample_size: int, U: int, backend: str, seed: int) -> Tuple[List[int], int]:
+    """Точка входа процесса: подключаемся к общей памяти и считаем попытку."""
+    segments = {}
+    try:
+        arrays = {}
+        for key, (name, shape, dtype) in shared.items():
+            segments[key] = shared_memory.SharedMemory(name=name)
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=segments[key].buf)
+        return _run_fast_attempt(
+            arrays["ranks"], arrays["weights"], arrays["ranked"],
+            sample_size, U, backend, seed,
+        )
+    finally:
+        arrays = None
+        for seg in segments.values():
+            seg.close()
+
+
+def _run_attempts_parallel(
+    arrays: Dict[str, np.ndarray],
+    seeds: List[int],
+    sample_size: int,
+    U: int,
+    backend: str,
+    workers: int,
+    on_done: Callable[[int, Tuple[List[int], int]], None],
+) -> None:
+    """
+    Попытки в ProcessPoolExecutor. ranks/weights/ranked передаются один раз
+    через shared_memory, в задачи уходят только имена сегментов и seed.
+    on_done(номер попытки, результат) вызывается по мере готовности.
+    """
+    segments: List[shared_memory.SharedMemory] = []
+    try:
+        shared = {}
+        for key, arr in arrays.items():
+            seg = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            segments.append(seg)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=seg.buf)[...] = arr
+            shared[key] = (seg.name, arr.shape, arr.dtype.str)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_fast_attempt_worker, shared, sample_size, U, backend, s): i
+                for i, s in enumerate(seeds)
+            }
+            try:
+                for f in as_completed(futures):
+                    on_done(futures[f], f.result())
+            except BaseException:
+                for f in futures:
+                    f.cancel()
+                raise
+    finally:
+        for seg in segments:
+            seg.close()
+            seg.unlink()
 
 
 def fast_greedy_v2(
         numbers: List[int],
-        triple_index,
-        all_triples,
         attempts: int = 8,
-        sample_size: int = 2000
+        sample_size: int = 2000,
+        backend: str = "int",
+        seed: Optional[int] = None,
+        workers: Optional[int] = None,
+        progress: Optional[ProgressFn] = None,
+        on_event: Optional[EventFn] = None
     ) -> Dict:
     """
     Быстрый greedy с AI-весами и семплированием.
     ВАЖНО: реально имеет смысл для больших пулов (30+ чисел).
     На малых пулах Classic обычно лучше и быстрее.
+    backend="numpy" считает веса всех кандидатов векторно по массиву индексов троек.
+    Попытки идут параллельно в пуле процессов (workers, по умолчанию — по числу ядер);
+    каждая получает свой seed из seed, поэтому результат воспроизводим
+    и не зависит от числа процессов.
+    Кандидаты и индексы троек берутся из общего кэша (services/candidate_cache.py).
     """
-    import random
+    if backend not in MASK_BACKENDS:
+        return {"error": f"Unknown mask backend: {backend}"}
+    attempts = max(1, attempts)
 
     base = sorted(set(numbers))
 
-    combos = [
-        c for c in combinations(base, BALL_COUNT)
-        if not has_four_in_row(c)
-    ]
+    cands = candidate_set(base)
+    combos = relabel(base, cands["positions"])
     if not combos:
         return {
             "system": [],
@@ -213,63 +570,80 @@ def fast_greedy_v2(
             "warning": "All combos filtered out."
         }
 
-    masks = [_mask_for_combo(c, triple_index) for c in combos]
-    weights = _build_rarity_weights(triple_index, combos)
+    U = cands["U"]
+    ranks = cands["ranks"]
+    weights = _build_rarity_weights(ranks, U)
 
-    U = len(all_triples)
     best_result = None
 
     total_candidates = len(combos)
     sample_size = min(sample_size, total_candidates)
 
-    for attempt in range(attempts):
-        # Начальное рейтинговое упорядочивание (по всей вселенной)
-        uncovered_mask = (1 << U) - 1
-        scored_indices = []
-        for idx, m in enumerate(masks):
-            sc = _ai_weight_for_mask(m, weights, uncovered_mask)
-            scored_indices.append((sc, idx))
-
-        scored_indices.sort(key=lambda x: x[0], reverse=True)
-
-        # Семплирование: половина лучших + половина случайных
-        top_cut = max(50, sample_size // 2)
-        top_cut = min(top_cut, sample_size, len(scored_indices))
-
-        top_part = [idx for _, idx in scored_indices[:top_cut]]
-        remaining_indices = [idx for _, idx in scored_indices[top_cut:]]
-
-        random_part_count = sample_size - len(top_part)
-        if remaining_indices and random_part_count > 0:
-            random_part = random.sample(remaining_indices, min(random_part_count, len(remaining_indices)))
-        else:
-            random_part = []
-
-        sampled_idx = top_part + random_part
-
-        s_masks = [masks[i] for i in sampled_idx]
-
-        # Greedy цикл по сэмплу
-        uncovered_mask = (1 << U) - 1
-        chosen_idxs: List[int] = []
-
-        while uncovered_mask:
-            best_local_idx = None
-            best_score = 0.0
-
-            for local_idx, m in enumerate(s_masks):
-                sc = _ai_weight_for_mask(m, weights, uncovered_mask)
-                if sc > best_score:
-                    best_score = sc
-                    best_local_idx = local_idx
-
-            if best_local_idx is None or best_score <= 0:
-                break
+    w_arr = bitset.as_weights(weights)
+
+    # Начальное рейтинговое упорядочивание (по всей вселенной).
+    # От попытки не зависит — считаем один раз.
+    if backend == "numpy":
+        initial_scores = bitset.weighted_gains(ranks, w_arr, bitset.full_flags(U)).tolist()
+    else:
+        full_mask = (1 << U) - 1
+        initial_scores = [
+            _ai_weight_for_mask(m, weights, full_mask)
+            for m in candidate_masks(base)
+        ]
+
+    ranked = np.asarray(
+        sorted(range(total_candidates), key=initial_scores.__getitem__, reverse=True),
+        dtype=np.int64,
+    )
 
-            chosen_idxs.append(sampled_idx[best_local_idx])
-            uncovered_mask &= ~s_masks[best_local_idx]
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    seeds = _attempt_seeds(seed, attempts)
+
+    # Процессов не больше, чем ядер и попыток: workers приходит из тела запроса
+    cpus = os.cpu_count() or 1
+    if workers is None:
+        workers = cpus
+    workers = max(1, min(workers, cpus, attempts))
+
+    outcomes: List[Tuple[List[int], int]] = [None] * attempts
+    best_covered = 0
+    live_best: Optional[Tuple[int, int]] = None
+
+    def on_done(i: int, outcome: Tuple[List[int], int]) -> None:
+        nonlocal best_covered, live_best
+        outcomes[i] = outcome
+        done = sum(1 for o in outcomes if o is not None)
+        chosen_idxs, remaining = outcome
+        best_covered = max(best_covered, U - remaining)
+        if progress:
+            progress(done, best_covered, U)
+
+        # Лучшая система среди уже завершённых попыток (в порядке завершения)
+        key = (U - remaining, -len(chosen_idxs))
+        if live_best is None or key > live_best:
+            live_best = key
+            if on_event:
+                on_event({
+                    "event": "best",
+                    "attempt": i + 1,
+                    "attempts_done": done,
+                    "system": [list(combos[j]) for j in chosen_idxs],
+                    "system_size": len(chosen_idxs),
+                    "coverage": round((U - remaining) / U * 100, 2),
+                })
+
+    if workers > 1:
+        _run_attempts_parallel(
+            {"ranks": ranks, "weights": w_arr, "ranked": ranked},
+            seeds, sample_size, U, backend, workers, on_done,
+        )
+    else:
+        for i, s in enumerate(seeds):
+            on_done(i, _run_fast_attempt(ranks, w_arr, ranked, sample_size, U, backend, s))
 
-        remaining = uncovered_mask.bit_count()
+    for attempt, (chosen_idxs, remaining) in enumerate(outcomes):
         covered = U - remaining
         coverage = round(covered / U * 100, 2)
 
@@ -300,6 +674,9 @@ def fast_greedy_v2(
         "coverage": best_result["coverage"],
         "attempts": attempts,
         "sample_size": sample_size,
+        "backend": backend,
+        "seed": seed,
+        "workers": workers,
         "triplets_total": U,
         "triplets_covered": int(best_result["coverage"] / 100 * U),
         "uncovered_triplets": []
@@ -310,58 +687,106 @@ def fast_greedy_v2(
 # Hybrid Greedy — постоптимизация Classic
 # ==========================================================
 
-def hybrid_greedy(numbers: List[int]) -> Dict:
+HYBRID_RESTARTS = 4
+
+
+def _prune_redundant(
+    order: List[int],
+    ticket_triples: List[List[int]],
+    base_count: List[int],
+) -> List[int]:
+    """
+    Один проход удаления в порядке order со счётчиками кратности покрытия:
+    билет избыточен, если каждая его тройка покрыта ещё кем-то (count > 1).
+    Проверка и удаление — O(C(k, 3)) на билет. Возвращает оставшиеся индексы.
+    """
+    count = list(base_count)
+    kept: List[int] = []
+    for idx in order:
+        triples = ticket_triples[idx]
+        if all(count[t] > 1 for t in triples):
+            for t in triples:
+                count[t] -= 1
+        else:
+            kept.append(idx)
+    return sorted(kept)
+
+
+def hybrid_greedy(
+    numbers: List[int],
+    backend: str = "int",
+    restarts: int = HYBRID_RESTARTS,
+    seed: Optional[int] = None,
+    progress: Optional[ProgressFn] = None,
+    on_event: Optional[EventFn] = None
+) -> Dict:
     """
     Hybrid режим:
       1) строим систему Classic greedy_cover()
-      2) пытаемся уменьшить её, поочередно выбрасывая билеты,
-         если при этом сохраняется 100% покрытие троек.
+      2) выбрасываем избыточные билеты (все их тройки покрыты другими),
+         пробуя несколько порядков удаления:
+           - "sequential" — порядок выбора greedy;
+           - "weakest"    — сначала билеты с наименьшим числом
+                            «уникальных» троек и наибольшим перекрытием;
+           - "random"     — restarts случайных перестановок (seed).
+         Оставляем самую короткую систему.
     Гарантия: количество билетов НЕ увеличится, coverage не уменьшится.
+    Кратность покрытия каждой тройки хранится в счётчиках, поэтому
+    проход удаления линейный по размеру системы.
     """
-    base_res = greedy_cover(numbers)
+    engine = "classic" if backend == "numpy" else "lazy"
+    base_res = greedy_cover(numbers, engine=engine, backend=backend, progress=progress, on_event=on_event)
     if base_res.get("coverage", 0.0) < 99.9:
         # Classic не дал полного покрытия — оптимизировать нечего
         return base_res
 
-    base = sorted(set(numbers))
-    all_triples, triple_index = _build_triple_universe(base)
-    U = len(all_triples)
-    full_mask_target = (1 << U) - 1
-
     combos = [tuple(c) for c in base_res["system"]]
     if not combos:
         return base_res
 
-    masks = [_mask_for_combo(c, triple_index) for c in combos]
-
-    # текущий список индексов билетов в системе
-    active_indices = list(range(len(combos)))
-
-    # Перебираем билеты и пробуем выбросить "слабые"
-    changed = True
-    while changed:
-        changed = False
-        # Проходим по копии списка, чтобы можно было модифицировать active_indices
-        for idx in list(active_indices):
-            # пробуем удалить этот билет
-            other_indices = [i for i in active_indices if i != idx]
-            if not other_indices:
-                continue
-
-            mask_without = 0
-            for j in other_indices:
-                mask_without |= masks[j]
-
-            if mask_without == full_mask_target:
-                # удаляем билет из системы
-                active_indices.remove(idx)
-                changed = True
-                # обновляем целевой full_mask_target на случай,
-                # если по какой-то причине он был "избыточным"
-                full_mask_target = mask_without
-                break  # начать цикл сначала с обновленным списком
-
-    reduced_combos = [list(combos[i]) for i in active_indices]
+    base = sorted(set(numbers))
+    U = comb(len(base), 3)
+
+    ranks = bitset.triple_ranks(combos, base)
+    ticket_triples = ranks.tolist()
+    base_count = np.bincount(ranks.ravel(), minlength=U).tolist()
+
+    def weakness(idx: int) -> Tuple[int, int]:
+        triples = ticket_triples[idx]
+        unique = sum(1 for t in triples if base_count[t] == 1)
+        overlap = sum(base_count[t] for t in triples)
+        return unique, -overlap
+
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    rng = random.Random(seed)
+
+    n = len(combos)
+    orders: List[Tuple[str, List[int]]] = [
+        ("sequential", list(range(n))),
+        ("weakest", sorted(range(n), key=weakness)),
+    ]
+    for _ in range(max(0, restarts or 0)):
+        order = list(range(n))
+        rng.shuffle(order)
+        orders.append(("random", order))
+
+    best_indices: Optional[List[int]] = None
+    best_order = "sequential"
+    for name, order in orders:
+        kept = _prune_redundant(order, ticket_triples, base_count)
+        if best_indices is None or len(kept) < len(best_indices):
+            best_indices, best_order = kept, name
+            if on_event:
+                on_event({
+                    "event": "best",
+                    "removal_order": name,
+                    "system": [list(combos[i]) for i in kept],
+                    "system_size": len(kept),
+                    "coverage": 100.0,
+                })
+
+    reduced_combos = [list(combos[i]) for i in best_indices]
 
     return {
         "system": reduced_combos,
@@ -369,7 +794,12 @@ def hybrid_greedy(numbers: List[int]) -> Dict:
         "coverage": 100.0,
         "triplets_total": U,
         "triplets_covered": U,
-        "uncovered_triplets": []
+        "uncovered_triplets": [],
+        "backend": backend,
+        "initial_size": len(combos),
+        "removal_order": best_order,
+        "restarts": max(0, restarts or 0),
+        "seed": seed,
     }
 
 
@@ -381,11 +811,73 @@ def greedy_entry(
     numbers: List[int],
     mode: str = "classic",
     attempts: int = 5,
-    sample_size: int = 2000
+    sample_size: int = 2000,
+    backend: str = "int",
+    memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    time_budget_ms: Optional[int] = None,
+    use_library: bool = True,
+    ticket_size: Optional[int] = None,
+    guarantee: Optional[int] = None,
+    draw_match: Optional[int] = None,
+    progress: Optional[ProgressFn] = None,
+    on_event: Optional[EventFn] = None
+) -> Dict:
+    """
+    Единая точка входа /greedy (и фоновых задач, и потоковой выдачи).
+    К результату добавляется coverage_by_t — покрытие пар / троек / четвёрок пула.
+    """
+    result = _greedy_dispatch(
+        numbers, mode, attempts, sample_size, backend, memory_limit_mb, seed, workers,
+        time_budget_ms, use_library, ticket_size, guarantee, draw_match, progress, on_event
+    )
+    if "error" not in result and "system" in result:
+        result["coverage_by_t"] = coverage_metrics(result["system"], numbers)
+    return result
+
+
+def _greedy_dispatch(
+    numbers: List[int],
+    mode: str = "classic",
+    attempts: int = 5,
+    sample_size: int = 2000,
+    backend: str = "int",
+    memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    time_budget_ms: Optional[int] = None,
+    use_library: bool = True,
+    ticket_size: Optional[int] = None,
+    guarantee: Optional[int] = None,
+    draw_match: Optional[int] = None,
+    progress: Optional[ProgressFn] = None,
+    on_event: Optional[EventFn] = None
 ) -> Dict:
 
     base = sorted(set(numbers))
-    all_triples, triple_index = _build_triple_universe(base)
+
+    # Колёса, отличные от классического 3-из-5: обобщённый движок (v, k, t, m)
+    k = BALL_COUNT if ticket_size is None else ticket_size
+    t = 3 if guarantee is None else guarantee
+    m = t if draw_match is None else draw_match
+    if (k, t, m) != (BALL_COUNT, 3, 3):
+        from .covering import covering_greedy
+        return covering_greedy(
+            numbers,
+            ticket_size=k,
+            guarantee=t,
+            draw_match=m,
+            memory_limit_mb=memory_limit_mb or DEFAULT_MEMORY_LIMIT_MB,
+            progress=progress,
+            on_event=on_event
+        )
+
+    if mode == "auto":
+        return _auto_entry(
+            numbers, attempts, sample_size, memory_limit_mb, seed, workers,
+            time_budget_ms, use_library, progress, on_event
+        )
 
     # На небольших пулах fast-режим не даёт выигрыш, а может быть медленнее.
     # Поэтому принудительно переключаем на classic, если пул маленький.
@@ -393,19 +885,60 @@ def greedy_entry(
         mode = "classic"
 
     if mode == "classic":
-        return greedy_cover(numbers)
+        # Параметры проверяем до библиотеки: ошибка та же, что у greedy_cover
+        error = _engine_error("classic", backend)
+        if error:
+            return {"error": error}
+        # Готовая система из библиотеки (services/design_library.py),
+        # если для этого размера пула она есть и не нарушает 4-в-ряд
+        if use_library:
+            from .design_library import lookup_design
+            found = lookup_design(base)
+            if found is not None:
+                return found
+        return greedy_cover(numbers, backend=backend, progress=progress, on_event=on_event)
+
+    if mode in ("lazy", "index"):
+        return greedy_cover(numbers, engine=mode, backend=backend, progress=progress, on_event=on_event)
 
     if mode == "fast":
         return fast_greedy_v2(
             numbers=numbers,
-            triple_index=triple_index,
-            all_triples=all_triples,
             attempts=attempts,
-            sample_size=sample_size
+            sample_size=sample_size,
+            backend=backend,
+            seed=seed,
+            workers=workers,
+            progress=progress,
+            on_event=on_event
         )
 
     if mode == "hybrid":
-        return hybrid_greedy(numbers)
+        return hybrid_greedy(
+            numbers,
+            backend=backend,
+            seed=seed,
+            progress=progress,
+            on_event=on_event
+        )
+
+    if mode == "chunked":
+        return chunked_greedy_cover(
+            numbers,
+            memory_limit_mb=memory_limit_mb,
+            progress=progress,
+            on_event=on_event
+        )
+
+    if mode == "anneal":
+        from .greedy_anneal import anneal_cover, DEFAULT_TIME_BUDGET_MS
+        return anneal_cover(
+            numbers,
+            time_budget_ms=DEFAULT_TIME_BUDGET_MS if time_budget_ms is None else time_budget_ms,
+            seed=seed,
+            progress=progress,
+            on_event=on_event
+        )
 
     return {"error": f"Unknown mode: {mode}"}
 
@@ -413,11 +946,97 @@ def greedy_entry(
 # API WRAPPER (for FastAPI)
 # ==========================================================
 
+# Движок, выбранный моделью стоимости -> (mode, backend) для greedy_entry
+_AUTO_MODES = {
+    "lazy": ("lazy", "int"),
+    "numpy": ("classic", "numpy"),
+    "hybrid": ("hybrid", "int"),
+    "chunked": ("chunked", "int"),
+    "fast": ("fast", "int"),
+    "anneal": ("anneal", "int"),
+}
+
+
+def _auto_entry(
+    numbers: List[int],
+    attempts: int,
+    sample_size: int,
+    memory_limit_mb: int,
+    seed: Optional[int],
+    workers: Optional[int],
+    time_budget_ms: Optional[int],
+    use_library: bool,
+    progress: Optional[ProgressFn],
+    on_event: Optional[EventFn]
+) -> Dict:
+    """
+    mode="auto": движок выбирает модель стоимости (services/cost_model.py)
+    по размеру пула, числу кандидатов, U, памяти и бюджету time_budget_ms.
+    В ответ добавляется блок "auto" с предсказанным и фактическим временем.
+    """
+    import time
+    from .cost_model import choose_engine, pool_features
+
+    base = sorted(set(numbers))
+    started = time.perf_counter()
+
+    found = None
+    if use_library:
+        from .design_library import lookup_design
+        found = lookup_design(base)
+
+    choice = choose_engine(
+        len(base),
+        memory_limit_mb=memory_limit_mb or DEFAULT_MEMORY_LIMIT_MB,
+        time_budget_ms=time_budget_ms,
+        attempts=attempts,
+        workers=workers,
+        library_hit=found is not None,
+    )
+
+    if found is not None:
+        result = found
+    else:
+        mode, backend = _AUTO_MODES[choice["engine"]]
+        result = _greedy_dispatch(
+            numbers,
+            mode=mode,
+            attempts=attempts,
+            sample_size=sample_size,
+            backend=backend,
+            memory_limit_mb=memory_limit_mb,
+            seed=seed,
+            workers=workers,
+            time_budget_ms=time_budget_ms,
+            use_library=False,
+            progress=progress,
+            on_event=on_event
+        )
+
+    result["auto"] = {
+        **choice,
+        **pool_features(len(base)),
+        "actual_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    return result
+
+
 def run_greedy(
     numbers: List[int],
     mode: str = "classic",
     attempts: int = 5,
-    sample_size: int = 2000
+    sample_size: int = 2000,
+    backend: str = "int",
+    memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    time_budget_ms: Optional[int] = None,
+    use_library: bool = True,
+    ticket_size: Optional[int] = None,
+    guarantee: Optional[int] = None,
+    draw_match: Optional[int] = None,
+    progress: Optional[ProgressFn] = None,
+    on_event: Optional[EventFn] = None
 ) -> Dict:
     """
     Thin API wrapper for FastAPI.
@@ -426,6 +1045,17 @@ def run_greedy(
         numbers=numbers,
         mode=mode,
         attempts=attempts,
-        sample_size=sample_size
+        sample_size=sample_size,
+        backend=backend,
+        memory_limit_mb=memory_limit_mb,
+        seed=seed,
+        workers=workers,
+        time_budget_ms=time_budget_ms,
+        use_library=use_library,
+        ticket_size=ticket_size,
+        guarantee=guarantee,
+        draw_match=draw_match,
+        progress=progress,
+        on_event=on_event
     )
 
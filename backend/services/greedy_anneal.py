@@ -0,0 +1,208 @@
+# backend/services/greedy_anneal.py
+from __future__ import annotations
+import math
+import random
+import time
+from itertools import combinations
+from typing import List, Dict, Tuple, Optional, Callable
+
+from .greedy import greedy_cover, has_four_in_row
+
+
+# ==========================================================
+# Anneal — anytime-улучшение системы после greedy
+# ==========================================================
+# Стартуем с полной системы greedy_cover(), затем в пределах
+# time_budget_ms пытаемся уменьшить её на один билет за раз:
+#   1) убираем билет с наименьшим числом «уникальных» троек;
+#   2) если появились непокрытые тройки — simulated annealing:
+#      берём случайную непокрытую тройку T, билет B, у которого с T
+#      общие две позиции, и заменяем в B одно число на недостающее из T.
+#      Цена = число непокрытых троек, ход принимается по Метрополису.
+# Как только цена = 0, запоминаем систему как лучшую и снова убираем билет.
+# Возвращается лучшая система с полным покрытием, найденная к дедлайну.
+
+DEFAULT_TIME_BUDGET_MS = 2000
+
+_T_START = 0.3
+_T_MIN = 0.02
+_COOLING = 0.98
+_MOVES_PER_TEMP = 32
+_CLOCK_EVERY = 256
+
+
+def anneal_cover(
+    numbers: List[int],
+    time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
+    seed: Optional[int] = None,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+    on_event: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Greedy + локальный поиск с бюджетом времени.
+    Гарантия: система не больше, чем у greedy_cover(), покрытие 100%.
+    progress(moves, covered, total) — во время greedy и раз в _CLOCK_EVERY ходов.
+    on_event — билеты стартового greedy, затем {"event": "best"} на каждую
+    найденную систему меньшего размера.
+    """
+    started = time.perf_counter()
+    deadline = started + max(0, time_budget_ms or 0) / 1000.0
+
+    base_res = greedy_cover(numbers, engine="lazy", progress=progress, on_event=on_event)
+    if base_res.get("coverage", 0.0) < 100.0 or not base_res.get("system"):
+        # Greedy не дал полного покрытия — улучшать нечего
+        return base_res
+
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    rng = random.Random(seed)
+
+    base = sorted(set(numbers))
+    v = len(base)
+    pos = {n: i for i, n in enumerate(base)}
+
+    # Плоская таблица индексов троек по позициям (i < j < k)
+    rank3 = [-1] * (v * v * v)
+    for idx, (i, j, k) in enumerate(combinations(range(v), 3)):
+        rank3[(i * v + j) * v + k] = idx
+    U = base_res["triplets_total"]
+
+    def triples_of(block: Tuple[int, ...]) -> List[int]:
+        return [rank3[(i * v + j) * v + k] for i, j, k in combinations(block, 3)]
+
+    def allowed(block: Tuple[int, ...]) -> bool:
+        return not has_four_in_row([base[p] for p in block])
+
+    system: List[Tuple[int, ...]] = [tuple(pos[n] for n in c) for c in base_res["system"]]
+    system_triples: List[List[int]] = [triples_of(b) for b in system]
+
+    count = [0] * U
+    for tr in system_triples:
+        for t in tr:
+            count[t] += 1
+
+    # Непокрытые тройки: список + позиция в списке (O(1) выбор и удаление)
+    uncovered: List[int] = []
+    where = [-1] * U
+
+    def mark_uncovered(t: int) -> None:
+        where[t] = len(uncovered)
+        uncovered.append(t)
+
+    def mark_covered(t: int) -> None:
+        i = where[t]
+        last = uncovered.pop()
+        if last != t:
+            uncovered[i] = last
+            where[last] = i
+        where[t] = -1
+
+    all_triples = list(combinations(range(v), 3))
+    best = list(system)
+    moves = 0
+
+    def drop_weakest() -> None:
+        """Убираем билет с наименьшим числом троек, покрытых только им."""
+        weakest = min(
+            range(len(system)),
+            key=lambda b: sum(1 for t in system_triples[b] if count[t] == 1),
+        )
+        for t in system_triples[weakest]:
+            count[t] -= 1
+            if count[t] == 0:
+                mark_uncovered(t)
+        system[weakest] = system[-1]
+        system_triples[weakest] = system_triples[-1]
+        system.pop()
+        system_triples.pop()
+
+    temperature = _T_START
+    while len(system) > 1:
+        if not uncovered:
+            if on_event and len(system) < len(best):
+                on_event({
+                    "event": "best",
+                    "moves": moves,
+                    "system": sorted(sorted(base[p] for p in block) for block in system),
+                    "system_size": len(system),
+                    "coverage": 100.0,
+                })
+            best = list(system)
+            if time.perf_counter() >= deadline:
+                break
+            drop_weakest()
+            temperature = _T_START
+            continue
+
+        moves += 1
+        if moves % _CLOCK_EVERY == 0:
+            if progress:
+                progress(moves, U - len(uncovered), U)
+            if time.perf_counter() >= deadline:
+                break
+        if moves % _MOVES_PER_TEMP == 0:
+            temperature *= _COOLING
+            if temperature < _T_MIN:
+                temperature = _T_START
+
+        target = all_triples[uncovered[rng.randrange(len(uncovered))]]
+        target_set = set(target)
+
+        # Билеты, пересекающиеся с целевой тройкой ровно по двум позициям
+        touching = [
+            b for b, block in enumerate(system)
+            if len(target_set.intersection(block)) == 2
+        ]
+        if not touching:
+            continue
+
+        b = touching[rng.randrange(len(touching))]
+        block = system[b]
+        missing = (target_set - set(block)).pop()
+        outside = [p for p in block if p not in target_set]
+        drop = outside[rng.randrange(len(outside))]
+        new_block = tuple(sorted([p for p in block if p != drop] + [missing]))
+        if not allowed(new_block):
+            continue
+
+        old_tr = system_triples[b]
+        new_tr = triples_of(new_block)
+        old_set, new_set = set(old_tr), set(new_tr)
+        removed = [t for t in old_tr if t not in new_set]
+        added = [t for t in new_tr if t not in old_set]
+
+        delta = sum(1 for t in removed if count[t] == 1) - sum(1 for t in added if count[t] == 0)
+        if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+            continue
+
+        for t in removed:
+            count[t] -= 1
+            if count[t] == 0:
+                mark_uncovered(t)
+        for t in added:
+            if count[t] == 0:
+                mark_covered(t)
+            count[t] += 1
+        system[b] = new_block
+        system_triples[b] = new_tr
+
+    if not uncovered and len(system) < len(best):
+        best = list(system)
+
+    result_system = sorted(sorted(base[p] for p in block) for block in best)
+    elapsed_ms = int((time.perf_counter() - started) * 1000)
+
+    return {
+        "system": result_system,
+        "system_size": len(result_system),
+        "coverage": 100.0,
+        "triplets_total": U,
+        "triplets_covered": U,
+        "uncovered_triplets": [],
+        "engine": "anneal",
+        "initial_size": base_res["system_size"],
+        "time_budget_ms": time_budget_ms,
+        "elapsed_ms": elapsed_ms,
+        "moves": moves,
+        "seed": seed,
+    }
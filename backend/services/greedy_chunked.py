@@ -0,0 +1,210 @@
+# backend/services/greedy_chunked.py
+from __future__ import annotations
+import heapq
+import tempfile
+from itertools import combinations, islice, chain
+from math import comb
+from typing import List, Dict, Tuple, Optional, Callable, Iterator
+
+import numpy as np
+
+from .config import BALL_COUNT
+from . import bitset
+
+
+# ==========================================================
+# Chunked Greedy — покрытие троек с ограничением памяти
+# ==========================================================
+# Для пулов 45–50 чисел список combos + маска на каждого кандидата
+# не помещается в память. Здесь кандидаты хранятся компактно —
+# позиции чисел в пуле, uint8 (n, BALL_COUNT) — и разбиты на блоки.
+# Для каждого блока держим только устаревшую верхнюю оценку его
+# лучшего прироста (lazy greedy на уровне блоков): блок пересчитывается,
+# только когда оказался на вершине кучи. Если позиции не влезают в
+# потолок памяти, они уходят в memmap во временном файле.
+
+DEFAULT_MEMORY_LIMIT_MB = 256
+BLOCK_ROWS = 4096
+
+# Сколько байт рабочей памяти уходит на строку пересчитываемого блока:
+# индексы троек int32 + флаги + позиции и значения для фильтра
+_ROW_WORK_BYTES = 10 * 4 + 10 + BALL_COUNT * 9
+
+# Доля потолка, которую могут занять позиции кандидатов в RAM
+_POSITIONS_SHARE = 0.5
+
+GENERATE_ROWS = 1 << 16
+
+
+def four_in_row_rows(values: np.ndarray) -> np.ndarray:
+    """Векторный has_four_in_row для строк отсортированных значений."""
+    step = np.diff(values, axis=1) == 1
+    if step.shape[1] < 3:
+        return np.zeros(values.shape[0], dtype=bool)
+    return (step[:, :-2] & step[:, 1:-1] & step[:, 2:]).any(axis=1)
+
+
+def position_blocks(values: np.ndarray, k: int, rows: int = GENERATE_ROWS) -> Iterator[np.ndarray]:
+    """
+    k-подмножества позиций 0..v-1 (v = len(values)) без 4-в-ряд блоками
+    до rows строк: uint8 (r, k) в лексикографическом порядке. values —
+    числа пула по позициям (int64), по ним проверяется правило 4-в-ряд.
+    Рабочая память — один блок, а не весь список combinations().
+    """
+    it = combinations(range(len(values)), k)
+    while True:
+        flat = np.fromiter(chain.from_iterable(islice(it, rows)), dtype=np.uint8)
+        if flat.size == 0:
+            return
+        block = flat.reshape(-1, k)
+        yield block[~four_in_row_rows(values[block])]
+
+
+def _candidate_positions(
+    base: List[int],
+    memory_limit: int,
+) -> Tuple[np.ndarray, bool]:
+    """
+    Позиции всех кандидатов без 4-в-ряд в лексикографическом порядке.
+    Возвращает (positions, spilled) — spilled=True, если массив лежит в memmap.
+    """
+    v = len(base)
+    upper = comb(v, BALL_COUNT)
+    spilled = upper * BALL_COUNT > memory_limit * _POSITIONS_SHARE
+
+    if spilled:
+        positions = np.memmap(tempfile.TemporaryFile(), dtype=np.uint8, mode="w+", shape=(upper, BALL_COUNT))
+    else:
+        positions = np.empty((upper, BALL_COUNT), dtype=np.uint8)
+
+    n = 0
+    for rows in position_blocks(np.asarray(base, dtype=np.int64), BALL_COUNT):
+        positions[n:n + rows.shape[0]] = rows
+        n += rows.shape[0]
+
+    return positions[:n], spilled
+
+
+def chunked_greedy_cover(
+    numbers: List[int],
+    memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+    block_size: Optional[int] = None,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+    on_event: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Greedy покрытие троек с ограниченной памятью.
+    Система та же, что у greedy_cover(): ничьи решаются в пользу
+    лексикографически меньшего кандидата.
+    memory_limit_mb — потолок на кандидатов и рабочие блоки.
+    progress(done, covered, total) и on_event({"event": "ticket", ...}) —
+    после каждого выбранного билета.
+    """
+    from .greedy import _ticket_event
+
+    base = sorted(set(numbers))
+    if len(base) < BALL_COUNT:
+        return {
+            "system": [],
+            "system_size": 0,
+            "coverage": 0.0,
+            "triplets_total": 0,
+            "triplets_covered": 0,
+            "uncovered_triplets": [],
+            "warning": f"Not enough numbers for BALL_COUNT={BALL_COUNT}"
+        }
+    if memory_limit_mb is None or memory_limit_mb <= 0:
+        return {"error": "memory_limit_mb must be > 0"}
+
+    memory_limit = int(memory_limit_mb) * 1024 * 1024
+    v = len(base)
+    table = bitset.triple_rank_table(v)
+    U = comb(v, 3)
+
+    rows_budget = max(1, int(memory_limit * (1 - _POSITIONS_SHARE)) // _ROW_WORK_BYTES)
+    block = max(1, min(block_size or BLOCK_ROWS, rows_budget))
+
+    positions, spilled = _candidate_positions(base, memory_limit)
+    n = positions.shape[0]
+    if n == 0:
+        return {
+            "system": [],
+            "system_size": 0,
+            "coverage": 0.0,
+            "triplets_total": U,
+            "triplets_covered": 0,
+            "uncovered_triplets": [list(t) for t in combinations(base, 3)],
+            "warning": "All candidate combos filtered out (4-in-row rule)."
+        }
+
+    uncovered = bitset.full_flags(U)
+    per_ticket = comb(BALL_COUNT, 3)
+    n_blocks = (n + block - 1) // block
+    gain_evaluations = 0
+
+    def best_in_block(b: int) -> Tuple[int, int]:
+        """(лучший прирост, индекс строки) в блоке b для текущего uncovered."""
+        start = b * block
+        ranks = bitset.ranks_from_positions(positions[start:start + block].astype(np.intp), table)
+        g = uncovered[ranks].sum(axis=1)
+        pos = int(np.argmax(g))
+        return int(g[pos]), start + pos
+
+    # Изначально все тройки не покрыты — верхняя оценка любого блока = C(5, 3)
+    heap = [(-per_ticket, b, -1) for b in range(n_blocks)]
+    best_rows = [0] * n_blocks
+    chosen_rows: List[int] = []
+
+    step = 0
+    covered_so_far = 0
+    while heap and uncovered.any():
+        neg_bound, b, stamp = heap[0]
+
+        if stamp == step:
+            row = best_rows[b]
+            chosen_rows.append(row)
+            ranks = bitset.ranks_from_positions(positions[row:row + 1].astype(np.intp), table)
+            uncovered[ranks[0]] = False
+            step += 1
+            covered_so_far -= neg_bound
+            if progress:
+                progress(step, covered_so_far, U)
+            if on_event:
+                on_event(_ticket_event(step, [base[p] for p in positions[row]], -neg_bound, covered_so_far, U))
+            # блок остаётся в куче со своей (теперь устаревшей) оценкой
+            continue
+
+        gain, row = best_in_block(b)
+        gain_evaluations += min(block, n - b * block)
+        if gain == 0:
+            heapq.heappop(heap)
+        else:
+            best_rows[b] = row
+            heapq.heapreplace(heap, (-gain, b, step))
+
+    remaining = int(uncovered.sum())
+    covered = U - remaining
+    coverage = round(covered / U * 100, 2)
+
+    uncovered_list: List[List[int]] = []
+    if remaining > 0:
+        for i, tri in enumerate(combinations(base, 3)):
+            if uncovered[i]:
+                uncovered_list.append(list(tri))
+
+    system = [[base[p] for p in positions[r]] for r in chosen_rows]
+
+    return {
+        "system": system,
+        "system_size": len(system),
+        "coverage": coverage,
+        "triplets_total": U,
+        "triplets_covered": covered,
+        "uncovered_triplets": uncovered_list,
+        "engine": "chunked",
+        "gain_evaluations": gain_evaluations,
+        "memory_limit_mb": memory_limit_mb,
+        "block_size": block,
+        "blocks": n_blocks,
+        "spilled": spilled,
+    }
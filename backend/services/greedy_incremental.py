@@ -0,0 +1,154 @@
+# backend/services/greedy_incremental.py
+from __future__ import annotations
+from itertools import combinations
+from math import comb
+from typing import List, Dict, Optional, Callable
+
+import numpy as np
+
+from .config import BALL_COUNT
+from . import bitset
+from .greedy import _prune_redundant, _rank_lazy_picks, _ticket_event
+from .greedy_chunked import four_in_row_rows
+
+
+# ==========================================================
+# Incremental greedy — дозаполнение системы при росте пула
+# ==========================================================
+# Пользователь добавил в пул одно-два числа: старая система уже
+# покрывает все прежние тройки, непокрытыми остаются только тройки
+# с новыми числами. Считаем, какие тройки нового пула система уже
+# покрывает, и берём кандидатов только среди билетов, содержащих хотя
+# бы одно число из множества, задевающего все непокрытые тройки
+# (обычно это сами новые числа): (j чисел из него) + (5 - j прочих).
+# Их C(v, 5) - C(v - d, 5), а не C(v, 5) — работа растёт с дельтой.
+# Дальше lazy greedy (CELF, greedy._rank_lazy_picks) по флагам непокрытых троек и, по желанию,
+# проход удаления избыточных билетов (как в hybrid_greedy).
+
+
+def _delta_positions(v: int, touched: List[int]) -> np.ndarray:
+    """Кандидаты (позиции) хотя бы с одной позицией из touched, в лексикографическом порядке."""
+    touched_set = set(touched)
+    rest = [p for p in range(v) if p not in touched_set]
+    rows = []
+    for j in range(1, min(len(touched), BALL_COUNT) + 1):
+        for inner in combinations(touched, j):
+            for outer in combinations(rest, BALL_COUNT - j):
+                rows.append(inner + outer)
+    if not rows:
+        return np.zeros((0, BALL_COUNT), dtype=np.intp)
+    positions = np.sort(np.array(rows, dtype=np.intp), axis=1)
+    order = np.lexsort(positions.T[::-1])
+    return positions[order]
+
+
+def _hitting_positions(triples: np.ndarray, v: int) -> List[int]:
+    """
+    Небольшое множество позиций, задевающее каждую непокрытую тройку
+    (жадно по частоте). При добавлении чисел это и есть новые числа.
+    """
+    hit: List[int] = []
+    left = triples
+    while left.shape[0]:
+        p = int(np.argmax(np.bincount(left.ravel(), minlength=v)))
+        hit.append(p)
+        left = left[(left != p).all(axis=1)]
+    return sorted(hit)
+
+
+def extend_system(
+    system: List[List[int]],
+    numbers: List[int],
+    prune: bool = False,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+    on_event: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Дополняет готовую систему до полного покрытия троек нового пула numbers.
+    Билеты system сохраняются (числа вне пула просто не дают троек),
+    новые билеты выбираются только под непокрытые тройки.
+    prune=True — затем убираем билеты, все тройки которых покрыты другими.
+    """
+    base = sorted(set(numbers))
+    v = len(base)
+    if v < BALL_COUNT:
+        return {
+            "system": [list(t) for t in system],
+            "system_size": len(system),
+            "coverage": 0.0,
+            "triplets_total": 0,
+            "triplets_covered": 0,
+            "uncovered_triplets": [],
+            "warning": f"Not enough numbers for BALL_COUNT={BALL_COUNT}"
+        }
+
+    U = comb(v, 3)
+    table = bitset.triple_rank_table(v)
+    pos = {n: i for i, n in enumerate(base)}
+
+    def ticket_ranks(ticket: List[int]) -> List[int]:
+        inside = sorted(pos[n] for n in set(ticket) if n in pos)
+        return [int(table[i, j, k]) for i, j, k in combinations(inside, 3)]
+
+    old_tickets = [sorted(t) for t in system]
+    old_ranks = [ticket_ranks(t) for t in old_tickets]
+
+    uncovered = np.ones(U, dtype=bool)
+    for ranks in old_ranks:
+        uncovered[ranks] = False
+
+    all_triples = np.array(list(combinations(range(v), 3)), dtype=np.intp)
+    touched = _hitting_positions(all_triples[uncovered], v)
+
+    positions = _delta_positions(v, touched)
+    if positions.shape[0]:
+        positions = positions[~four_in_row_rows(np.asarray(base, dtype=np.int64)[positions])]
+    n = positions.shape[0]
+    ranks = bitset.ranks_from_positions(positions, table) if n else np.zeros((0, 10), dtype=np.int32)
+
+    covered_so_far = U - int(uncovered.sum())
+    added_rows: List[int] = []
+    stats = {"gain_evaluations": 0}
+
+    for i, gain in _rank_lazy_picks(ranks, uncovered, stats):
+        added_rows.append(i)
+        covered_so_far += gain
+        if progress:
+            progress(len(added_rows), covered_so_far, U)
+        if on_event:
+            on_event(_ticket_event(len(added_rows), [base[p] for p in positions[i]], gain, covered_so_far, U))
+
+    added = [[base[p] for p in positions[i]] for i in added_rows]
+    tickets = old_tickets + added
+    pruned = 0
+
+    if prune and tickets:
+        ticket_triples = old_ranks + [ranks[i].tolist() for i in added_rows]
+        base_count = [0] * U
+        for triples in ticket_triples:
+            for t in triples:
+                base_count[t] += 1
+        kept = _prune_redundant(list(range(len(tickets))), ticket_triples, base_count)
+        pruned = len(tickets) - len(kept)
+        tickets = [tickets[i] for i in kept]
+
+    remaining = U - covered_so_far
+    uncovered_list: List[List[int]] = []
+    if remaining > 0:
+        for i in np.flatnonzero(uncovered).tolist():
+            uncovered_list.append([base[p] for p in all_triples[i]])
+
+    return {
+        "system": tickets,
+        "system_size": len(tickets),
+        "coverage": round(covered_so_far / U * 100, 2),
+        "triplets_total": U,
+        "triplets_covered": covered_so_far,
+        "uncovered_triplets": uncovered_list,
+        "engine": "incremental",
+        "previous_size": len(old_tickets),
+        "added": added,
+        "pruned": pruned,
+        "candidates_considered": n,
+        "gain_evaluations": stats["gain_evaluations"],
+    }
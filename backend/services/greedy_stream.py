@@ -0,0 +1,96 @@
+# backend/services/greedy_stream.py
+from __future__ import annotations
+import json
+import queue
+import threading
+from typing import Dict, Any, Iterator
+
+from .greedy import run_greedy
+
+
+# ==========================================================
+# Потоковая выдача greedy: NDJSON / Server-Sent Events
+# ==========================================================
+# run_greedy() работает в отдельном потоке и отдаёт события через
+# on_event (см. greedy.EventFn) в ограниченную очередь, а HTTP-ответ
+# читает из неё по мере появления:
+#   {"event": "ticket", ...}  — очередной билет greedy и покрытие;
+#   {"event": "best", ...}    — улучшенная система (fast / anneal);
+#   {"event": "result", ...}  — итоговый ответ, как у POST /greedy;
+#   {"event": "error", ...}   — расчёт упал.
+# Клиент закрыл соединение — генератор закрывается, поток видит флаг
+# остановки на следующем событии и прерывает расчёт.
+
+STREAM_FORMATS = ("ndjson", "sse")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+# Если клиент не успевает читать, поток расчёта ждёт место в очереди
+_QUEUE_SIZE = 256
+_PUT_TIMEOUT = 0.5
+
+_DONE = object()
+
+
+class StreamClosed(Exception):
+    """Бросается из on_event, когда клиент ушёл."""
+
+
+def _format(event: Dict[str, Any], fmt: str) -> str:
+    data = json.dumps(event, separators=(",", ":"))
+    if fmt == "sse":
+        return f"event: {event['event']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+def stream_greedy(params: Dict[str, Any], fmt: str = "ndjson") -> Iterator[str]:
+    """
+    Генератор строк ответа для run_greedy(**params).
+    fmt="ndjson" — один JSON на строку, fmt="sse" — text/event-stream.
+    """
+    if fmt not in STREAM_FORMATS:
+        yield _format({"event": "error", "error": f"Unknown stream format: {fmt}"}, "ndjson")
+        return
+
+    events: "queue.Queue[Any]" = queue.Queue(maxsize=_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item: Any) -> None:
+        while True:
+            if stop.is_set():
+                raise StreamClosed()
+            try:
+                events.put(item, timeout=_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+
+    def worker() -> None:
+        try:
+            result = run_greedy(**params, on_event=put)
+            if "error" in result:
+                put({"event": "error", **result})
+            else:
+                put({"event": "result", **result})
+        except StreamClosed:
+            return
+        except Exception as e:
+            try:
+                put({"event": "error", "error": str(e)})
+            except StreamClosed:
+                return
+        try:
+            put(_DONE)
+        except StreamClosed:
+            pass
+
+    thread = threading.Thread(target=worker, name="greedy-stream", daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = events.get()
+            if item is _DONE:
+                break
+            yield _format(item, fmt)
+    finally:
+        stop.set()
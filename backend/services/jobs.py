@@ -0,0 +1,207 @@
+# backend/services/jobs.py
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Dict, Any, Optional, Callable
+
+from .greedy import run_greedy
+from .budget import budget_entry
+from .generator import generate_system
+
+
+# ==========================================================
+# Фоновые задачи: greedy / budget / generate
+# ==========================================================
+# Тяжёлые расчёты уходят в ограниченный пул процессов, HTTP-обработчик
+# сразу возвращает job_id. Прогресс и флаги отмены живут в словарях
+# multiprocessing.Manager: воркер пишет туда после каждого шага движка
+# (см. greedy.ProgressFn) и там же проверяет, не отменили ли задачу.
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+MAX_ACTIVE_JOBS = 16
+JOB_TTL_SECONDS = 3600
+
+_lock = threading.Lock()
+_jobs: Dict[str, Dict[str, Any]] = {}
+_pool: Optional[ProcessPoolExecutor] = None
+_manager = None
+_progress = None
+_cancel_flags = None
+
+
+class JobCancelled(Exception):
+    """Бросается из progress-колбэка, когда задачу отменили."""
+
+
+# ----------------------------------------------------------
+# Исполнители (работают внутри процесса пула)
+# ----------------------------------------------------------
+
+Report = Callable[[int, float, Dict[str, Any]], None]
+
+
+def _run_greedy_job(params: Dict[str, Any], report: Report) -> Dict:
+    def progress(done: int, covered: int, total: int) -> None:
+        fraction = covered / total if total else 0.0
+        report(done, fraction, {"current_coverage": round(fraction * 100, 2)})
+
+    return run_greedy(**params, progress=progress)
+
+
+def _run_budget_job(params: Dict[str, Any], report: Report) -> Dict:
+    def progress(done: int, total: int, info: Dict[str, Any]) -> None:
+        report(done, done / total if total else 0.0, info)
+
+    return budget_entry(**params, progress=progress)
+
+
+def _run_generate_job(params: Dict[str, Any], report: Report) -> Dict:
+    def progress(checked: int, found: int, total: int) -> None:
+        report(checked, checked / total if total else 0.0, {"found": found})
+
+    return generate_system(**params, progress=progress)
+
+
+JOB_RUNNERS = {
+    "greedy": _run_greedy_job,
+    "budget": _run_budget_job,
+    "generate": _run_generate_job,
+}
+
+
+def _job_worker(job_id: str, kind: str, params: Dict[str, Any], progress_store, cancel_flags) -> Dict:
+    started = time.time()
+
+    def report(iterations: int, fraction: float, extra: Dict[str, Any]) -> None:
+        if cancel_flags.get(job_id):
+            raise JobCancelled(job_id)
+        progress_store[job_id] = {
+            "started_at": started,
+            "iterations": iterations,
+            "fraction": fraction,
+            **extra,
+        }
+
+    report(0, 0.0, {})
+    return JOB_RUNNERS[kind](params, report)
+
+
+# ----------------------------------------------------------
+# API процесса-сервера
+# ----------------------------------------------------------
+
+def _ensure_pool() -> None:
+    global _pool, _manager, _progress, _cancel_flags
+    if _pool is None:
+        _manager = multiprocessing.Manager()
+        _progress = _manager.dict()
+        _cancel_flags = _manager.dict()
+        _pool = ProcessPoolExecutor(max_workers=JOB_WORKERS)
+
+
+def _purge_expired(now: float) -> None:
+    for job_id in [
+        j for j, job in _jobs.items()
+        if job["future"].done() and now - job["created_at"] > JOB_TTL_SECONDS
+    ]:
+        _jobs.pop(job_id, None)
+        _progress.pop(job_id, None)
+        _cancel_flags.pop(job_id, None)
+
+
+def submit_job(kind: str, params: Dict[str, Any]) -> Dict:
+    """
+    Ставит задачу в пул. Возвращает {job_id, status} или {error, reason}:
+    reason="unknown_kind" — нет такого исполнителя,
+    reason="too_many_jobs" — достигнут MAX_ACTIVE_JOBS.
+    """
+    if kind not in JOB_RUNNERS:
+        return {"error": f"Unknown job kind: {kind}", "reason": "unknown_kind"}
+
+    with _lock:
+        _ensure_pool()
+        now = time.time()
+        _purge_expired(now)
+
+        active = sum(1 for job in _jobs.values() if not job["future"].done())
+        if active >= MAX_ACTIVE_JOBS:
+            return {"error": f"Too many active jobs (limit {MAX_ACTIVE_JOBS})", "reason": "too_many_jobs"}
+
+        job_id = uuid.uuid4().hex
+        future: Future = _pool.submit(_job_worker, job_id, kind, params, _progress, _cancel_flags)
+        job = {"kind": kind, "future": future, "created_at": now, "finished_at": None}
+        future.add_done_callback(lambda _f: job.__setitem__("finished_at", time.time()))
+        _jobs[job_id] = job
+
+    return {"job_id": job_id, "kind": kind, "status": "queued"}
+
+
+def _status(job: Dict[str, Any], job_id: str) -> str:
+    future: Future = job["future"]
+    if future.cancelled():
+        return "cancelled"
+    if future.done():
+        exc = future.exception()
+        if exc is None:
+            return "done"
+        return "cancelled" if isinstance(exc, JobCancelled) else "failed"
+    if _cancel_flags.get(job_id):
+        return "cancelling"
+    return "running" if job_id in _progress else "queued"
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    """Статус, прогресс (итерации, покрытие, ETA) и результат, если готов."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        status = _status(job, job_id)
+        snapshot = dict(_progress.get(job_id) or {})
+
+    out: Dict[str, Any] = {
+        "job_id": job_id,
+        "kind": job["kind"],
+        "status": status,
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
+
+    if snapshot:
+        started = snapshot.pop("started_at")
+        fraction = snapshot.pop("fraction", 0.0)
+        elapsed = (job["finished_at"] or time.time()) - started
+        eta = None
+        if status == "running" and 0.0 < fraction < 1.0:
+            eta = round(elapsed * (1.0 - fraction) / fraction, 1)
+        out["progress"] = {
+            **snapshot,
+            "percent": round(fraction * 100, 2),
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": eta,
+        }
+
+    if status == "done":
+        out["result"] = job["future"].result()
+    elif status == "failed":
+        out["error"] = str(job["future"].exception())
+
+    return out
+
+
+def cancel_job(job_id: str) -> Optional[Dict]:
+    """Отмена: ещё не начатая задача снимается из очереди, идущая — на следующем шаге."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        if not job["future"].done():
+            _cancel_flags[job_id] = True
+            job["future"].cancel()
+        status = _status(job, job_id)
+
+    return {"job_id": job_id, "status": status}
@@ -0,0 +1,170 @@
+# backend/services/prize_distribution.py
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, islice, chain
+from math import comb
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from .covering import binom_table, colex_rank
+
+
+# ==========================================================
+# Точное распределение лучшего совпадения по всем тиражам
+# ==========================================================
+# Игра k/N (например, 5/69): тираж — k чисел из 1..N, всего C(N, k).
+# Для каждого тиража нужно max по билетам |билет ∩ тираж|.
+#
+# Вместо сравнения тиража с каждым билетом (тиражи x билеты) строим
+# для j = 1..k таблицу hit_j[colex-ранг j-подмножества] — True, если
+# это j-подмножество целиком лежит в каком-то билете. Тогда
+#     лучшее совпадение >= j  <=>  одно из C(k, j) j-подмножеств тиража в hit_j,
+# и на тираж уходит sum C(k, j) = 2^k - 1 обращений к таблицам
+# независимо от размера системы.
+#
+# Тиражи перебираются блоками, сгруппированными по наименьшему числу;
+# группы раздаются по процессам (ProcessPoolExecutor), таблицы каждый
+# процесс строит один раз в initializer.
+
+MAX_DRAWS = 200_000_000
+_BLOCK_DRAWS = 1 << 16
+
+# Таблицы процесса-воркера пула: (k, N, [hit_1..hit_k], binom).
+# Последовательный путь строит их локально и передаёт в _count_group.
+_worker_state: Optional[Tuple] = None
+
+
+def parse_game(game: str) -> Tuple[int, int]:
+    """'5/69' -> (k=5, N=69)."""
+    try:
+        k, n = (int(x) for x in str(game).split("/"))
+    except ValueError:
+        raise ValueError(f"Bad game profile '{game}', expected 'k/N' like '5/69'")
+    if not (1 <= k <= n):
+        raise ValueError(f"Bad game profile '{game}': need 1 <= k <= N")
+    return k, n
+
+
+def _hit_tables(tickets: List[List[int]], k: int, n: int, table: np.ndarray) -> List[np.ndarray]:
+    """hit_j для j = 1..k: какие j-подмножества 1..N содержатся в билетах."""
+    hits = [np.zeros(0, dtype=bool)]
+    for j in range(1, k + 1):
+        hit = np.zeros(comb(n, j), dtype=bool)
+        for ticket in tickets:
+            if len(ticket) < j:
+                continue
+            subsets = np.array(list(combinations(ticket, j)), dtype=np.intp)
+            hit[colex_rank(subsets, table)] = True
+        hits.append(hit)
+    return hits
+
+
+def _build_state(tickets: List[List[int]], k: int, n: int) -> Tuple:
+    table = binom_table(n, k)
+    return k, n, _hit_tables(tickets, k, n, table), table
+
+
+def _init_worker(tickets: List[List[int]], k: int, n: int) -> None:
+    global _worker_state
+    _worker_state = _build_state(tickets, k, n)
+
+
+def _best_matches(draws: np.ndarray, k: int, hits: List[np.ndarray], table: np.ndarray) -> np.ndarray:
+    """Лучшее совпадение для блока тиражей (B, k) позиций 0..N-1."""
+    best = np.zeros(draws.shape[0], dtype=np.int8)
+    for j in range(1, k + 1):
+        any_hit = np.zeros(draws.shape[0], dtype=bool)
+        for cols in combinations(range(k), j):
+            any_hit |= hits[j][colex_rank(draws[:, cols], table)]
+        if not any_hit.any():
+            # если нет совпадения в j, то и в j+1 нет
+            break
+        best[any_hit] = j
+    return best
+
+
+def _count_group(first: int, state: Optional[Tuple] = None) -> np.ndarray:
+    """
+    Распределение по тиражам, у которых наименьшая позиция = first.
+    state — таблицы _build_state; без него берутся таблицы воркера пула.
+    """
+    k, n, hits, table = state if state is not None else _worker_state
+    counts = np.zeros(k + 1, dtype=np.int64)
+    it = combinations(range(first + 1, n), k - 1)
+    while True:
+        rows = list(islice(it, _BLOCK_DRAWS))
+        if not rows:
+            break
+        rest = np.fromiter(chain.from_iterable(rows), dtype=np.intp, count=len(rows) * (k - 1))
+        draws = np.empty((len(rows), k), dtype=np.intp)
+        draws[:, 0] = first
+        draws[:, 1:] = rest.reshape(len(rows), k - 1)
+        counts += np.bincount(_best_matches(draws, k, hits, table), minlength=k + 1)
+    return counts
+
+
+def prize_distribution(
+    system: List[List[int]],
+    game: str = "5/69",
+    workers: Optional[int] = None,
+) -> Dict:
+    """
+    Точное распределение лучшего совпадения системы по всем C(N, k) тиражам.
+    Возвращает:
+      {
+        game, draws_total,
+        distribution: {j: тиражей с лучшим совпадением j},
+        probabilities: {j: доля},
+        at_least: {j: доля тиражей с совпадением >= j}
+      }
+    """
+    try:
+        k, n = parse_game(game)
+    except ValueError as e:
+        return {"error": str(e)}
+    if not system:
+        return {"error": "System is empty"}
+
+    tickets: List[List[int]] = []
+    for ticket in system:
+        nums = sorted(set(ticket))
+        if any(x < 1 or x > n for x in nums):
+            return {"error": f"Ticket {ticket} has numbers outside 1..{n}"}
+        tickets.append([x - 1 for x in nums])
+
+    total = comb(n, k)
+    if total > MAX_DRAWS:
+        return {"error": f"Too many draws: C({n}, {k}) = {total} (limit {MAX_DRAWS})"}
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, os.cpu_count() or 1, n - k + 1))
+
+    counts = np.zeros(k + 1, dtype=np.int64)
+    groups = range(n - k + 1)
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(tickets, k, n),
+        ) as pool:
+            for part in pool.map(_count_group, groups):
+                counts += part
+    else:
+        state = _build_state(tickets, k, n)
+        for first in groups:
+            counts += _count_group(first, state)
+
+    at_least = np.cumsum(counts[::-1])[::-1]
+
+    return {
+        "game": f"{k}/{n}",
+        "system_size": len(system),
+        "draws_total": total,
+        "distribution": {j: int(counts[j]) for j in range(k + 1)},
+        "probabilities": {j: float(counts[j] / total) for j in range(k + 1)},
+        "at_least": {j: float(at_least[j] / total) for j in range(k + 1)},
+        "workers": workers,
+    }
@@ -0,0 +1,115 @@
+# backend/services/verifier.py
+from __future__ import annotations
+from itertools import combinations, islice, chain
+from math import comb
+from typing import List, Dict, Optional
+
+import numpy as np
+
+
+# ==========================================================
+# Проверка гарантии колеса
+# ==========================================================
+# Утверждение: «если m чисел из пула выпали, хотя бы один билет
+# совпал с ними минимум в t числах». Перебираем ВСЕ m-подмножества
+# пула блоками: строки матрицы принадлежности (число x билет) для
+# чисел подмножества складываются, максимум по билетам — лучшее
+# совпадение для этого тиража. Гарантия = минимум лучшего совпадения.
+
+DEFAULT_DRAW_MATCH = 3
+MAX_WORST_LISTED = 100
+MAX_SUBSETS = 50_000_000
+
+_BLOCK_SUBSETS = 1 << 14
+
+
+def verify_wheel(
+    system: List[List[int]],
+    numbers: Optional[List[int]] = None,
+    draw_match: int = DEFAULT_DRAW_MATCH,
+    guarantee: Optional[int] = None,
+    max_worst: Optional[int] = MAX_WORST_LISTED,
+) -> Dict:
+    """
+    Проверяет систему на всех m-подмножествах пула (draw_match = m).
+    numbers — пул; по умолчанию все числа, встречающиеся в system.
+    guarantee — заявленное t: в ответе holds = (гарантия >= t).
+    max_worst — сколько худших тиражей вернуть (None — MAX_WORST_LISTED).
+    Возвращает:
+      {
+        guarantee: int,             # min по тиражам лучшего совпадения
+        distribution: {j: count},   # сколько тиражей дают лучшее совпадение j
+        worst_subsets: [[...]],     # до max_worst тиражей с худшим совпадением
+        subsets_total: int,
+        holds: bool | None
+      }
+    """
+    if not system:
+        return {"error": "System is empty"}
+    if max_worst is None:
+        max_worst = MAX_WORST_LISTED
+
+    pool = sorted(set(numbers) if numbers else {n for ticket in system for n in ticket})
+    v = len(pool)
+    m = draw_match
+    if m is None or m < 1:
+        return {"error": "draw_match must be >= 1"}
+    if v < m:
+        return {"error": f"Pool has {v} numbers, fewer than draw_match={m}"}
+
+    total = comb(v, m)
+    if total > MAX_SUBSETS:
+        return {"error": f"Too many draws to check: C({v}, {m}) = {total} (limit {MAX_SUBSETS})"}
+
+    # Принадлежность: строка — число пула, столбец — билет (int8 хватает, m <= 127)
+    pos = {n: i for i, n in enumerate(pool)}
+    member = np.zeros((v, len(system)), dtype=np.int8)
+    for j, ticket in enumerate(system):
+        for n in set(ticket):
+            i = pos.get(n)
+            if i is not None:
+                member[i, j] = 1
+
+    distribution = np.zeros(m + 1, dtype=np.int64)
+    worst = m + 1
+    worst_rows: List[np.ndarray] = []
+    worst_count = 0
+
+    it = combinations(range(v), m)
+    while True:
+        flat = np.fromiter(chain.from_iterable(islice(it, _BLOCK_SUBSETS)), dtype=np.intp)
+        if flat.size == 0:
+            break
+        subsets = flat.reshape(-1, m)
+
+        matches = member[subsets[:, 0]].copy()
+        for c in range(1, m):
+            matches += member[subsets[:, c]]
+        best = matches.max(axis=1)
+
+        distribution += np.bincount(best, minlength=m + 1)
+
+        block_worst = int(best.min())
+        if block_worst < worst:
+            worst = block_worst
+            worst_rows = []
+            worst_count = 0
+        if block_worst == worst and worst_count < max_worst:
+            rows = subsets[best == worst][:max_worst - worst_count]
+            worst_rows.append(rows)
+            worst_count += rows.shape[0]
+
+    worst_subsets = [[pool[p] for p in row] for rows in worst_rows for row in rows.tolist()]
+
+    return {
+        "pool": pool,
+        "pool_size": v,
+        "system_size": len(system),
+        "draw_match": m,
+        "subsets_total": total,
+        "guarantee": worst,
+        "distribution": {j: int(distribution[j]) for j in range(m + 1) if distribution[j]},
+        "worst_count": int(distribution[worst]),
+        "worst_subsets": worst_subsets,
+        "holds": None if guarantee is None else worst >= guarantee,
+    }
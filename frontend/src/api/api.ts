@@ -43,3 +43,57 @@ export async function runBudget(payload: {
 
   return res.json();
 }
+
+/**
+ * Streaming generator (NDJSON): onEvent gets start / combinations / done / error
+ */
+export async function streamGenerateSystem(
+  payload: any,
+  onEvent: (event: any) => void,
+  flushSize = 1000
+) {
+  const res = await fetch(
+    `${API_BASE}/generate/stream?format=ndjson&flush_size=${flushSize}`,
+    {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(payload),
+    }
+  );
+
+  if (!res.ok || !res.body) {
+    const text = await res.text();
+    throw new Error(text || "Generation failed");
+  }
+
+  await readNdjson(res, onEvent);
+}
+
+/**
+ * NDJSON response reader: calls onEvent for every JSON line as it arrives
+ * (shared by the streaming generator and greedy endpoints)
+ */
+export async function readNdjson(res: Response, onEvent: (event: any) => void) {
+  if (!res.body) throw new Error("Response has no body");
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let newline;
+    while ((newline = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onEvent(JSON.parse(line));
+    }
+  }
+
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+}
@@ -1,4 +1,6 @@
 // frontend/src/api/greedy.ts
+import { readNdjson } from "./api";
+
 const API_BASE = import.meta.env.VITE_API_URL;
 
 export async function runGreedy(payload: any) {
@@ -11,3 +13,16 @@ export async function runGreedy(payload: any) {
     if (!res.ok) throw new Error("Greedy request failed");
     return res.json();
 }
+
+// Потоковый greedy: onEvent получает события ticket / best / result / error
+export async function streamGreedy(payload: any, onEvent: (event: any) => void) {
+    const res = await fetch(`${API_BASE}/greedy/stream?format=ndjson`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(payload),
+    });
+
+    if (!res.ok || !res.body) throw new Error("Greedy stream request failed");
+
+    await readNdjson(res, onEvent);
+}